@@ -6,7 +6,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('credentials.example.json', '.'), ('config.py', '.')],
-    hiddenimports=['customtkinter', 'google_auth_oauthlib', 'google_auth', 'googleapiclient', 'googleapiclient.discovery', 'requests', 'keyring', 'keyring.backends', 'dotenv'],
+    hiddenimports=['customtkinter', 'google_auth_oauthlib', 'google_auth', 'googleapiclient', 'googleapiclient.discovery', 'googleapiclient.errors', 'google_auth_oauthlib.flow', 'requests', 'aiohttp', 'keyring', 'keyring.backends', 'dotenv'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -18,7 +18,7 @@ a = Analysis(
         # Exclude other unused modules
         'IPython', 'jupyter', 'notebook',
         'PIL', 'cv2', 'opencv',
-        'sqlalchemy', 'sqlite3',
+        'sqlalchemy',
         'xml.etree.ElementTree',
         'logging.handlers',
         'multiprocessing',
@@ -71,38 +71,26 @@ def show_splash_and_load():
     
     # Load modules with progress updates
     global ctk, messagebox, filedialog, threading, ThreadPoolExecutor
-    global pickle, json, InstalledAppFlow, build, requests, base64, re
-    global HTMLParser, Path, webbrowser, HTTPServer, BaseHTTPRequestHandler
+    global json, re
+    global Path, webbrowser, HTTPServer, BaseHTTPRequestHandler
     global urlparse, parse_qs, config, GEMINI_API_KEY, SCOPES, TOKEN_CACHE_FILE, GEMINI_ENDPOINT
     
     update_splash("Loading UI framework...", 15)
     import customtkinter as ctk
     from tkinter import messagebox, filedialog
     
-    update_splash("Loading threading...", 25)
+    update_splash("Loading threading...", 40)
     import threading
     from concurrent.futures import ThreadPoolExecutor
     
-    update_splash("Loading utilities...", 35)
-    import pickle
+    update_splash("Loading utilities...", 65)
     import json
-    import base64
     import re
-    from html.parser import HTMLParser
     from pathlib import Path
     import webbrowser
     from http.server import HTTPServer, BaseHTTPRequestHandler
     from urllib.parse import urlparse, parse_qs
     
-    update_splash("Loading Google authentication...", 50)
-    from google_auth_oauthlib.flow import InstalledAppFlow
-    
-    update_splash("Loading Google APIs...", 70)
-    from googleapiclient.discovery import build
-    
-    update_splash("Loading network libraries...", 85)
-    import requests
-    
     update_splash("Loading configuration...", 95)
     try:
         import config
@@ -131,6 +119,17 @@ def show_splash_and_load():
 # Show splash and load modules
 show_splash_and_load()
 
+# Gmail/Gemini pipeline, shared with the headless CLI (summarize.py). The Google client
+# libraries and requests behind it are imported on first use (see LazyModule)
+from email_core import (
+    google_errors, google_oauth_flow, prewarm_imports,
+    save_credentials, load_credentials, delete_credentials, is_logged_in, build_gmail_service,
+    fetch_emails_batch, fetch_threads_batch, fetch_inbox_changes,
+    get_settings, settings_service,
+    EmailRecord, get_mail_store, delete_mail_store, clear_summary_cache, GeminiTransientError, SummaryScheduler, SummaryRequest,
+    PRIORITY_SELECTED, PRIORITY_VISIBLE, PRIORITY_BACKGROUND
+)
+
 # ========== MARKDOWN PARSER FOR TEXT DISPLAY ==========
 class MarkdownTextWidget(ctk.CTkTextbox):
     """Enhanced text widget that renders markdown formatting with actual text styles"""
@@ -230,6 +229,23 @@ class MarkdownTextWidget(ctk.CTkTextbox):
             self._insert_with_formatting("end", line)
             self._text_widget.insert("end", '\n')
     
+    def begin_stream(self):
+        """Start progressive rendering of a streamed response (see append_markdown)"""
+        self._stream_buffer = ""
+    
+    def append_markdown(self, text):
+        """Append streamed markdown, rendering only the lines completed so far"""
+        self._stream_buffer += text
+        complete, newline, self._stream_buffer = self._stream_buffer.rpartition('\n')
+        if newline:
+            self.insert_markdown("end", complete)
+    
+    def end_stream(self):
+        """Render whatever is left of the streamed response"""
+        if self._stream_buffer:
+            self.insert_markdown("end", self._stream_buffer)
+        self._stream_buffer = ""
+    
     def _insert_with_formatting(self, index, text):
         """Insert text with inline markdown formatting and URL detection"""
         # Pattern to match: ***bold italic***, **bold**, *italic*, `code`, and URLs
@@ -382,249 +398,45 @@ FONT_XXL = 14    # 2X large - headers
 FONT_TITLE = 26  # Title - main heading
 FONT_ICON = 20   # Icon size
 
-# ========== CREDENTIALS ==========
-def save_credentials(creds):
-    with open(TOKEN_CACHE_FILE, 'wb') as token:
-        pickle.dump(creds, token)
-
-def load_credentials():
-    if os.path.exists(TOKEN_CACHE_FILE):
-        with open(TOKEN_CACHE_FILE, 'rb') as token:
-            return pickle.load(token)
-    return None
-
-def delete_credentials():
-    if os.path.exists(TOKEN_CACHE_FILE):
-        os.remove(TOKEN_CACHE_FILE)
-        return True
-    return False
-
-def is_logged_in():
-    return os.path.exists(TOKEN_CACHE_FILE)
-
-# ========== EMAIL UTILS ==========
-class MLStripper(HTMLParser):
-    def __init__(self):
-        super().__init__()
-        self.reset()
-        self.strict = False
-        self.convert_charrefs = True
-        self.text = []
-        self.current_link = None
-
-    def handle_starttag(self, tag, attrs):
-        # Extract href from anchor tags and store it
-        if tag == 'a':
-            for attr, value in attrs:
-                if attr == 'href':
-                    self.current_link = value
-                    break
-
-    def handle_endtag(self, tag):
-        # When anchor tag ends, append the link if we have one
-        if tag == 'a' and self.current_link:
-            # Add the URL in parentheses after the link text
-            self.text.append(f' ({self.current_link})')
-            self.current_link = None
-
-    def handle_data(self, d):
-        self.text.append(d)
-
-    def get_data(self):
-        return ''.join(self.text)
-
-def strip_html_tags(html):
-    s = MLStripper()
-    try:
-        s.feed(html)
-        return s.get_data()
-    except:
-        return html
-
-def get_email_subject(service, message_id):
-    """Get email subject and sender from message metadata"""
-    try:
-        message = service.users().messages().get(userId='me', id=message_id, format='metadata').execute()
-        headers = message.get('payload', {}).get('headers', [])
-        subject = next((h['value'] for h in headers if h.get('name') == 'Subject'), "No Subject")
-        sender = next((h['value'] for h in headers if h.get('name') == 'From'), "Unknown")
-        return subject, sender
-    except Exception as e:
-        return "Error", str(e)
-
-def get_email_body_raw(service, message_id):
-    """Get the full email body/content with links extracted"""
-    try:
-        message = service.users().messages().get(userId='me', id=message_id, format='full').execute()
-        
-        def parse_parts(parts):
-            """Recursively parse email parts to find text and HTML content"""
-            text_body = ""
-            html_body = ""
-            
-            for part in parts:
-                mime_type = part.get('mimeType', '')
-                
-                # Check for nested parts (multipart)
-                if 'parts' in part:
-                    nested_text, nested_html = parse_parts(part['parts'])
-                    if nested_text and not text_body:
-                        text_body = nested_text
-                    if nested_html and not html_body:
-                        html_body = nested_html
-                
-                # Text content
-                elif mime_type == 'text/plain':
-                    data = part.get('body', {}).get('data', '')
-                    if data:
-                        text_body = base64.urlsafe_b64decode(data).decode('utf-8')
-                
-                # HTML content
-                elif mime_type == 'text/html':
-                    data = part.get('body', {}).get('data', '')
-                    if data:
-                        html_body = base64.urlsafe_b64decode(data).decode('utf-8')
-            
-            return text_body, html_body
-        
-        # Parse the email parts
-        parts = message.get('payload', {}).get('parts', [])
-        body = ""
-        
-        if parts:
-            text_body, html_body = parse_parts(parts)
-            # Prefer HTML to extract links, fallback to text
-            if html_body:
-                body = strip_html_tags(html_body)
-            elif text_body:
-                body = text_body
-        
-        # Fallback: try to get body from payload directly
-        if not body:
-            payload = message.get('payload', {})
-            mime_type = payload.get('mimeType', '')
-            data = payload.get('body', {}).get('data', '')
-            
-            if data:
-                decoded = base64.urlsafe_b64decode(data).decode('utf-8')
-                if mime_type == 'text/html':
-                    body = strip_html_tags(decoded)
-                else:
-                    body = decoded
-        
-        # Increase limit to 5000 to capture links at the end
-        return body[:5000] if body else ""
-    except Exception as e:
-        return f"Error reading email: {str(e)}"
-
-def gemini_summarize_and_reply(body, message_id=None):
-    try:
-        if not body.strip():
-            return "No email content to summarize."
-        
-        # Add Gmail link at the top if message_id is provided
-        gmail_link = ""
-        if message_id:
-            gmail_link = f"**📧 Open in Gmail:** https://mail.google.com/mail/u/0/#inbox/{message_id}\n\n"
-        
-        prompt = f"""You are an AI email assistant. Analyze the following email and provide a response.
-
-Your response MUST include the following sections:
-
-1. **SUMMARY** section:
-   - List only the most important points (3-5 bullet points max)
-   - Use * for bullet points
-   - Be brief and focused on key information only
-
-2. **RELEVANT LINKS** section (if there are any URLs/links in the email):
-   - Include a sub-heading: **Relevant Links**
-   - For each link, provide a descriptive title followed by the URL
-   - Format each link as: * [Link Description]: https://example.com
-   - The URL must start with http:// or https://
-   - Include a brief title that explains what the link is relevant to
-   - If no links found, skip this section entirely
-
-3. **DRAFT REPLY** section:
-   - Write a complete, ready-to-send professional email reply
-   - Include proper greeting and closing
-   - Address all important points from the original email
-   - Make it natural and conversational but professional
-   - This should be a full email, not a summary
-
-Formatting rules:
-- Use **SUMMARY**, **RELEVANT LINKS**, and **DRAFT REPLY** as section headers (bold inline, like **HEADER**)
-- For summary and links, use * for bullet lists
-- For links, format as: * [Title]: https://url
-- For draft reply, write as a complete email without bullet points
-- IMPORTANT: Format links as plain URLs starting with http:// or https:// so they are recognized as clickable
-- Make sure all sections are complete
-
-Email to analyze:
-{body}
-"""
-        
-        # Get API key from AppData/.env (priority) or config module (fallback)
-        api_key = ""
-        try:
-            app_data_path = Path(os.path.expanduser("~")) / "AppData" / "Roaming" / "ai-email-summarizer"
-            env_file_path = app_data_path / ".env"
-            if env_file_path.exists():
-                from dotenv import dotenv_values
-                env_vars = dotenv_values(env_file_path)
-                api_key = env_vars.get('GEMINI_API_KEY', '').strip()
-        except Exception:
-            pass
-        
-        # Fallback to config if not found in AppData
-        if not api_key:
-            api_key = config.GEMINI_API_KEY.strip() if config.GEMINI_API_KEY else ""
-        
-        # Include API key in the URL for Gemini API
-        api_url = f"{GEMINI_ENDPOINT}?key={api_key}"
-        
-        headers = {
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "contents": [
-                {
-                    "parts": [
-                        {"text": prompt}
-                    ]
-                }
-            ],
-            "generationConfig": {
-                "temperature": 0.3,
-                "maxOutputTokens": 4096
-            }
-        }
-        
-        response = requests.post(api_url, headers=headers, json=payload)
-        
-        resp_json = response.json()
-        
-        if 'candidates' in resp_json and resp_json['candidates']:
+# ========== UI DISPATCHER ==========
+class UIDispatcher:
+    """Runs UI updates posted from worker threads on the Tk main thread.
+    
+    Workers call post() instead of touching widgets; a single after()-scheduled pump
+    drains the queue on the main thread once per frame. Updates posted with a key
+    are coalesced, so only the latest one per key is applied each frame.
+    """
+    
+    def __init__(self, root, frame_ms=50):
+        self.root = root
+        self.frame_ms = frame_ms
+        self._lock = threading.Lock()
+        self._pending = []  # Callbacks in posting order
+        self._slots = {}  # key -> index of its callback in _pending
+        self.root.after(self.frame_ms, self._pump)
+    
+    def post(self, callback, key=None):
+        """Schedule callback() on the main thread; a newer post with the same key replaces it"""
+        with self._lock:
+            if key is not None and key in self._slots:
+                self._pending[self._slots[key]] = callback
+                return
+            if key is not None:
+                self._slots[key] = len(self._pending)
+            self._pending.append(callback)
+    
+    def _pump(self):
+        with self._lock:
+            pending, self._pending, self._slots = self._pending, [], {}
+        for callback in pending:
             try:
-                candidate = resp_json['candidates'][0]
-                ai_response = ""
-                if 'content' in candidate and 'parts' in candidate['content']:
-                    ai_response = candidate['content']['parts'][0]['text']
-                elif 'content' in candidate and 'text' in candidate['content']:
-                    ai_response = candidate['content']['text']
-                else:
-                    return f"Unexpected response structure"
-                
-                # Prepend Gmail link to the response
-                return gmail_link + ai_response
-            except (KeyError, IndexError, TypeError) as e:
-                return f"Error extracting text: {str(e)}"
-        elif 'error' in resp_json:
-            return f"Error from Gemini API: {resp_json['error'].get('message', 'Unknown Error')}"
-        else:
-            return "Gemini API response was empty or malformed"
-    except Exception as e:
-        return f"Error: {str(e)}"
+                callback()
+            except Exception:
+                pass
+        try:
+            self.root.after(self.frame_ms, self._pump)
+        except tk.TclError:
+            pass  # Window was destroyed
 
 # ========== CUSTOM COMPONENTS ==========
 class EmailListItem(ctk.CTkFrame):
@@ -651,10 +463,9 @@ class EmailListItem(ctk.CTkFrame):
         content.bind("<Button-1>", self._on_click)
         
         # Subject - Material Design typography
-        subject_text = subject[:50] + "..." if len(subject) > 50 else subject
         subject_label = ctk.CTkLabel(
             content,
-            text=subject_text,
+            text=self._truncate(subject),
             font=("Segoe UI", FONT_MD, "bold"),
             text_color=COLOR_PRIMARY,
             anchor="w",
@@ -664,10 +475,9 @@ class EmailListItem(ctk.CTkFrame):
         subject_label.bind("<Button-1>", self._on_click)
         
         # Sender - Secondary text color with proper contrast
-        sender_text = sender[:50] + "..." if len(sender) > 50 else sender
         sender_label = ctk.CTkLabel(
             content,
-            text=sender_text,
+            text=self._truncate(sender),
             font=("Segoe UI", FONT_XS),
             text_color=COLOR_TEXT_SECONDARY,
             anchor="w",
@@ -679,6 +489,15 @@ class EmailListItem(ctk.CTkFrame):
         self.subject_label_ref = subject_label
         self.sender_label_ref = sender_label
     
+    @staticmethod
+    def _truncate(text):
+        return text[:50] + "..." if len(text) > 50 else text
+    
+    def set_content(self, subject, sender):
+        """Show a different email in this row (used when rows are recycled)"""
+        self.subject_label_ref.configure(text=self._truncate(subject))
+        self.sender_label_ref.configure(text=self._truncate(sender))
+    
     def _on_click(self, event=None):
         self.is_selected = True
         # Active tab: green border only, no background color change
@@ -700,6 +519,150 @@ class EmailListItem(ctk.CTkFrame):
         # Return to default styling
         self.main_frame.configure(fg_color=COLOR_SURFACE, border_color=COLOR_BORDER, border_width=1)
         self.subject_label_ref.configure(text_color=COLOR_PRIMARY)
+        self.sender_label_ref.configure(text_color=COLOR_TEXT_SECONDARY)
+
+
+class VirtualEmailList(ctk.CTkFrame):
+    """Scrollable email list that recycles a fixed pool of EmailListItem rows.
+    
+    Only as many rows as fit on screen are created; scrolling rebinds them to a
+    window of the backing array of (id, subject, sender), so the widget count
+    stays O(visible rows) regardless of inbox size.
+    """
+    
+    ROW_HEIGHT = 75  # EmailListItem height plus padding
+    
+    def __init__(self, parent, command=None, on_view_change=None, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.command = command  # Called with the message id of a clicked row
+        self.on_view_change = on_view_change  # Called with the visible message ids when they change
+        self.items = []
+        self.selected_id = None
+        self.first_index = 0
+        self.rows = []
+        self._row_state = []  # (msg_id, selected) currently shown by each row
+        self._visible_ids = []
+        self._row_bg = kwargs.get("fg_color", COLOR_SURFACE)
+        
+        self.row_container = ctk.CTkFrame(self, fg_color=self._row_bg)
+        self.row_container.pack(side="left", fill="both", expand=True, padx=(4, 0), pady=4)
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y", pady=4)
+        
+        self.row_container.bind("<Configure>", lambda event: self._render())
+        self.bind_all("<MouseWheel>", self._on_mousewheel, add="+")
+        self.bind_all("<Button-4>", self._on_mousewheel, add="+")
+        self.bind_all("<Button-5>", self._on_mousewheel, add="+")
+    
+    # ----- Public API -----
+    def set_items(self, items, keep_scroll=False):
+        """Replace the backing array with a list of (msg_id, subject, sender)"""
+        self.items = list(items)
+        if not keep_scroll:
+            self.first_index = 0
+        self._row_state = [None] * len(self.rows)
+        self._render()
+    
+    def clear(self):
+        self.selected_id = None
+        self.set_items([])
+    
+    def select(self, msg_id):
+        """Highlight an email and scroll it into view"""
+        self.selected_id = msg_id
+        for index, item in enumerate(self.items):
+            if item[0] == msg_id:
+                visible = self._visible_rows()
+                if index < self.first_index:
+                    self.first_index = index
+                elif index >= self.first_index + visible:
+                    self.first_index = index - visible + 1
+                break
+        self._render()
+    
+    # ----- Rendering -----
+    def _visible_rows(self):
+        """Number of rows that fit completely in the list area"""
+        return max(1, self.row_container.winfo_height() // self.ROW_HEIGHT)
+    
+    def _render(self):
+        visible = self._visible_rows()
+        self.first_index = max(0, min(self.first_index, len(self.items) - visible))
+        
+        # Grow the pool to cover the visible area plus one partially visible row
+        while len(self.rows) < min(visible + 1, len(self.items)):
+            self._create_row()
+        
+        for slot, row in enumerate(self.rows):
+            index = self.first_index + slot
+            if index >= len(self.items):
+                row.place_forget()
+                self._row_state[slot] = None
+                continue
+            
+            msg_id, subject, sender = self.items[index]
+            state = (msg_id, msg_id == self.selected_id)
+            if self._row_state[slot] != state:
+                if self._row_state[slot] is None or self._row_state[slot][0] != msg_id:
+                    row.set_content(subject, sender)
+                if state[1]:
+                    row.apply_selection_style()
+                else:
+                    row.deselect()
+                row.msg_id = msg_id
+                self._row_state[slot] = state
+            row.place(x=0, y=slot * self.ROW_HEIGHT, relwidth=1.0)
+        
+        if self.items:
+            self.scrollbar.set(self.first_index / len(self.items),
+                               min(1.0, (self.first_index + visible) / len(self.items)))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        
+        visible_ids = [item[0] for item in self.items[self.first_index:self.first_index + visible + 1]]
+        if visible_ids != self._visible_ids:
+            self._visible_ids = visible_ids
+            if self.on_view_change:
+                self.on_view_change(visible_ids)
+    
+    def _create_row(self):
+        row = EmailListItem(self.row_container, subject="", sender="", fg_color=self._row_bg, height=65)
+        row.msg_id = None
+        row.command = lambda r=row: self._on_row_click(r)
+        self.rows.append(row)
+        self._row_state.append(None)
+    
+    def _on_row_click(self, row):
+        if row.msg_id is None:
+            return
+        self.select(row.msg_id)
+        if self.command:
+            self.command(row.msg_id)
+    
+    # ----- Scrolling -----
+    def _scroll_to(self, first_index):
+        if first_index != self.first_index:
+            self.first_index = first_index
+            self._render()
+    
+    def _on_scrollbar(self, action, *args):
+        if action == "moveto":
+            self._scroll_to(int(round(float(args[0]) * len(self.items))))
+        elif action == "scroll":
+            step = int(args[0]) * (self._visible_rows() if args[1] == "pages" else 1)
+            self._scroll_to(self.first_index + step)
+    
+    def _on_mousewheel(self, event):
+        # Only react to wheel events over the rows (the scrollbar handles its own)
+        if not str(event.widget).startswith(str(self.row_container)):
+            return
+        if event.num == 4:
+            step = -1
+        elif event.num == 5:
+            step = 1
+        else:
+            step = -1 if event.delta > 0 else 1
+        self._scroll_to(self.first_index + step)
 
 
 # ========== SETUP SCREEN ==========
@@ -1284,6 +1247,7 @@ class SetupScreen(ctk.CTkToplevel):
             config_module.GEMINI_API_KEY = api_key
             if cred_dest:
                 config_module.GMAIL_CREDENTIALS_FILE = str(cred_dest)
+            settings_service.invalidate()
             
             messagebox.showinfo(
                 "✓ Setup Complete",
@@ -1533,12 +1497,26 @@ class EmailSummarizerApp(ctk.CTk):
         self.configure(fg_color=COLOR_BG)
         
         self.service = None
-        self.emails = []
-        self.email_data = {}
+        self.email_ids = []  # Loaded emails in inbox order
+        self.email_data = {}  # id -> EmailRecord
         self.selected_email_id = None
-        self.email_items = []
         self.max_emails = 5
+        self.history_id = None  # Mailbox historyId of the last load, for incremental refresh
+        self._summary_stream_token = None  # Identifies the request allowed to stream into the summary panel
+        self.summary_scheduler = SummaryScheduler()  # Selected email first, then visible rows, then the rest
+        self._visible_email_ids = frozenset()  # Rows on screen (replaced, never mutated, so workers can read it)
+        self.loaded_max_emails = None
+        self.next_page_token = None  # Gmail pageToken of the first email not loaded yet
+        self._next_page = None  # (page token, future) of the prefetched next page
+        self._page_executor = ThreadPoolExecutor(max_workers=1)  # All page loads run here, one at a time
+        self._page_service = None  # Gmail client of the page worker (httplib2 is not thread-safe)
+        self._loading_more = False
+        self._load_generation = 0  # Bumped on every reset so stale page loads are dropped
         self.summarize_on_load = tk.BooleanVar(value=False)  # Toggle: lazy vs eager
+        self.group_threads = tk.BooleanVar(value=False)  # Toggle: one entry per message vs per conversation
+        self.loaded_threads = False  # Whether the loaded list holds conversations
+        self._search_query = ""  # Current search box text (empty: show the whole inbox)
+        self._search_after_id = None  # Pending debounced search
         self.current_theme = "dark"  # Track current theme
         self.setup_in_progress = True  # Track if setup is happening
         self.close_requested = False  # Track if user clicked close button
@@ -1563,11 +1541,19 @@ class EmailSummarizerApp(ctk.CTk):
         self.setup_in_progress = False
         
         # Now create widgets only after setup is done
+        self.ui = UIDispatcher(self)
         self.create_widgets()
         self.check_login_status()
+        if is_logged_in():
+            # Show the inbox from the last session right away; only changes are fetched
+            summarize = self.summarize_on_load.get()
+            threading.Thread(target=self._warm_start, args=(summarize,), daemon=True).start()
         
         # Show the window at full size
         self.after(0, self._show_fullscreen)
+        
+        # Load the Google client libraries in the background once the window is up
+        self.after(500, lambda: threading.Thread(target=prewarm_imports, daemon=True).start())
     
     def on_close_requested(self):
         """Handle window close button (X) - exit immediately"""
@@ -1585,50 +1571,58 @@ class EmailSummarizerApp(ctk.CTk):
         import sys
         sys.exit(0)
     
+    def _draw_icon(self, icon_path):
+        """Draw the envelope icon (same as splash screen) and save it as a multi-size .ico"""
+        from PIL import Image, ImageDraw
+        
+        # Create icon at ultra-high resolution for maximum sharpness
+        base_size = 1024
+        
+        # Create with dark background matching splash screen (#1a1a2e)
+        img = Image.new('RGBA', (base_size, base_size), (26, 26, 46, 255))
+        draw = ImageDraw.Draw(img, 'RGBA')
+        
+        # Draw clean blue outline envelope matching splash screen style
+        icon_color = (138, 180, 248, 255)  # Light blue #8AB4F8 - same as splash screen
+        line_width = 52  # Thick outline for visibility at small sizes
+        
+        # Envelope dimensions - nice proportions
+        margin = int(base_size * 0.18)
+        env_left = margin
+        env_top = int(base_size * 0.32)
+        env_right = base_size - margin
+        env_bottom = int(base_size * 0.68)
+        
+        # Draw envelope rectangle (outline only)
+        draw.rectangle([env_left, env_top, env_right, env_bottom], 
+                     outline=icon_color, width=line_width)
+        
+        # Draw envelope flap - two diagonal lines forming a V shape
+        center_x = base_size // 2
+        center_y = (env_top + env_bottom) // 2
+        
+        draw.line([env_left, env_top, center_x, center_y], fill=icon_color, width=line_width)
+        draw.line([env_right, env_top, center_x, center_y], fill=icon_color, width=line_width)
+        
+        # Save icon with multiple sizes for Windows (using high-quality downsampling)
+        icon_sizes = [(16, 16), (32, 32), (48, 48), (64, 64), (128, 128), (256, 256)]
+        img.save(icon_path, format='ICO', sizes=icon_sizes, quality=95)
+    
     def _create_and_set_icon(self):
         """Create and set email emoji icon for title bar and taskbar (same as splash screen)"""
         try:
             import os
             import sys
-            from PIL import Image, ImageDraw
             
             # Create app data directory
             app_data_dir = os.path.join(os.path.expanduser('~'), '.ai_email_summarizer')
             os.makedirs(app_data_dir, exist_ok=True)
             icon_path = os.path.join(app_data_dir, 'app_icon.ico')
             
-            # Create icon at ultra-high resolution for maximum sharpness
-            base_size = 1024
-            
-            # Create with dark background matching splash screen (#1a1a2e)
-            img = Image.new('RGBA', (base_size, base_size), (26, 26, 46, 255))
-            draw = ImageDraw.Draw(img, 'RGBA')
-            
-            # Draw clean blue outline envelope matching splash screen style
-            icon_color = (138, 180, 248, 255)  # Light blue #8AB4F8 - same as splash screen
-            line_width = 52  # Thick outline for visibility at small sizes
-            
-            # Envelope dimensions - nice proportions
-            margin = int(base_size * 0.18)
-            env_left = margin
-            env_top = int(base_size * 0.32)
-            env_right = base_size - margin
-            env_bottom = int(base_size * 0.68)
-            
-            # Draw envelope rectangle (outline only)
-            draw.rectangle([env_left, env_top, env_right, env_bottom], 
-                         outline=icon_color, width=line_width)
-            
-            # Draw envelope flap - two diagonal lines forming a V shape
-            center_x = base_size // 2
-            center_y = (env_top + env_bottom) // 2
-            
-            draw.line([env_left, env_top, center_x, center_y], fill=icon_color, width=line_width)
-            draw.line([env_right, env_top, center_x, center_y], fill=icon_color, width=line_width)
-            
-            # Save icon with multiple sizes for Windows (using high-quality downsampling)
-            icon_sizes = [(16, 16), (32, 32), (48, 48), (64, 64), (128, 128), (256, 256)]
-            img.save(icon_path, format='ICO', sizes=icon_sizes, quality=95)
+            # Reuse the icon drawn on a previous run; PIL is only imported to draw it the first time.
+            # (The app_icon.ico in the repo holds just a 16x16 image, too blurry for the taskbar.)
+            if not os.path.exists(icon_path):
+                self._draw_icon(icon_path)
             
             # Set icon for window title bar
             if os.path.exists(icon_path):
@@ -1745,7 +1739,7 @@ class EmailSummarizerApp(ctk.CTk):
         count_label.pack(side="left", padx=(4, 4))
         
         self.email_count_var = tk.StringVar(value="5")
-        count_options = ["2", "3", "5", "10", "20"]
+        count_options = ["2", "3", "5", "10", "20", "50", "100"]
         self.count_combo = ctk.CTkComboBox(
             left_buttons,
             values=count_options,
@@ -1791,6 +1785,30 @@ class EmailSummarizerApp(ctk.CTk):
         )
         self.summarize_toggle.pack(side="left", padx=(0, 8))
         
+        # Conversation mode toggle
+        threads_label = ctk.CTkLabel(
+            left_buttons,
+            text="Group by conversation:",
+            font=("Segoe UI", FONT_SM),
+            text_color=COLOR_TEXT
+        )
+        threads_label.pack(side="left", padx=(4, 6))
+        
+        self.threads_toggle = ctk.CTkSwitch(
+            left_buttons,
+            text="",
+            variable=self.group_threads,
+            onvalue=True,
+            offvalue=False,
+            fg_color=COLOR_ERROR,  # Red when OFF
+            progress_color=COLOR_ACCENT,  # Green when ON
+            button_color="#FFFFFF",
+            button_hover_color="#F0F0F0",
+            height=30,
+            width=50
+        )
+        self.threads_toggle.pack(side="left", padx=(0, 8))
+        
         # Divider
         divider3 = ctk.CTkFrame(left_buttons, fg_color=COLOR_BORDER, width=1, height=35)
         divider3.pack(side="left", padx=6)
@@ -1871,14 +1889,29 @@ class EmailSummarizerApp(ctk.CTk):
         )
         self.email_count_display.pack(anchor="w", padx=14, pady=(0, 8))
         
-        self.email_list_frame = ctk.CTkScrollableFrame(
+        # Search box: filters the list from the local mail store (no network)
+        self.search_entry = ctk.CTkEntry(
             left_panel,
+            placeholder_text="🔍 Search emails and summaries...",
+            height=32,
+            font=("Segoe UI", FONT_SM),
+            fg_color=COLOR_BG,
+            border_color=COLOR_BORDER,
+            border_width=1
+        )
+        self.search_entry.pack(fill="x", padx=8, pady=(0, 8))
+        self.search_entry.bind("<KeyRelease>", self._on_search_changed)
+        
+        self.email_list = VirtualEmailList(
+            left_panel,
+            command=self.select_email,
+            on_view_change=self._on_visible_emails_changed,
             fg_color=COLOR_SURFACE,
             width=350,
             height=650,
             corner_radius=8
         )
-        self.email_list_frame.pack(fill="both", expand=True, padx=8, pady=(0, 10))
+        self.email_list.pack(fill="both", expand=True, padx=8, pady=(0, 10))
         
         # Right panel - Summary
         right_panel = ctk.CTkFrame(content, fg_color=COLOR_SURFACE, corner_radius=10)
@@ -1977,20 +2010,7 @@ class EmailSummarizerApp(ctk.CTk):
     
     def check_login_status(self):
         # Get current API key from AppData .env (priority), then fall back to config
-        current_api_key = ""
-        try:
-            app_data_path = Path(os.path.expanduser("~")) / "AppData" / "Roaming" / "ai-email-summarizer"
-            env_file_path = app_data_path / ".env"
-            if env_file_path.exists():
-                from dotenv import dotenv_values
-                env_vars = dotenv_values(env_file_path)
-                current_api_key = env_vars.get('GEMINI_API_KEY', '').strip()
-        except Exception:
-            pass
-        
-        # Fallback to config if not found in AppData
-        if not current_api_key:
-            current_api_key = config.GEMINI_API_KEY.strip() if config.GEMINI_API_KEY else ""
+        current_api_key = get_settings().gemini_api_key
         
         if is_logged_in():
             self.status_label.configure(text="✓ Logged in - Ready to load emails")
@@ -2006,7 +2026,8 @@ class EmailSummarizerApp(ctk.CTk):
             
             self.logout_btn.configure(state="normal", fg_color=COLOR_ERROR, hover_color="#C5221F")
             self.change_creds_btn.configure(state="normal", fg_color="#6200EA", hover_color="#5E35B1")
-            self.service = self.get_service()
+            self.service = None  # Built on first Gmail use, off the UI thread (see load_emails)
+            self._page_service = None
         else:
             self.status_label.configure(text="✗ Not logged in")
             if getattr(self, 'status_icon', None):
@@ -2029,7 +2050,7 @@ class EmailSummarizerApp(ctk.CTk):
         try:
             import importlib
             import sys
-            from dotenv import load_dotenv, dotenv_values
+            from dotenv import load_dotenv
             
             # Keep looping until setup is complete (user cannot skip if no credentials exist)
             while self.setup_in_progress and not self.close_requested:
@@ -2077,16 +2098,9 @@ class EmailSummarizerApp(ctk.CTk):
                     import config as config_module
                     cred_exists = os.path.exists(config_module.GMAIL_CREDENTIALS_FILE)
                 
-                # Check if API key exists
-                app_data_path = Path(os.path.expanduser("~")) / "AppData" / "Roaming" / "ai-email-summarizer"
-                env_file_path = app_data_path / ".env"
-                
-                env_vars = dotenv_values(env_file_path) if env_file_path.exists() else {}
-                api_key_from_env = env_vars.get('GEMINI_API_KEY', '').strip()
-                
-                # Use API key from env or from config
-                import config as config_module
-                api_key_exists = bool(api_key_from_env or (config_module.GEMINI_API_KEY and config_module.GEMINI_API_KEY.strip()))
+                # Check if API key exists (AppData .env or config)
+                env_file_path = settings_service.env_path
+                api_key_exists = bool(get_settings().gemini_api_key)
                 
                 # Check if setup is complete
                 setup_complete = cred_exists and api_key_exists
@@ -2121,6 +2135,7 @@ class EmailSummarizerApp(ctk.CTk):
                     globals()['GEMINI_API_KEY'] = config_module.GEMINI_API_KEY
                 except Exception as e:
                     pass
+                settings_service.invalidate()
                 
                 # Loop back to check if setup was completed successfully
                 # If user cancelled without saving, the loop will show the setup screen again
@@ -2131,19 +2146,16 @@ class EmailSummarizerApp(ctk.CTk):
     def get_service(self):
         creds = load_credentials()
         if creds:
-            return build('gmail', 'v1', credentials=creds)
+            return build_gmail_service(creds)
         return None
     
     def open_change_credentials(self):
         """Open the setup screen to change credentials and API key"""
         # Get current credentials to pre-fill the form
-        app_data_path = Path(os.path.expanduser("~")) / "AppData" / "Roaming" / "ai-email-summarizer"
-        env_file_path = app_data_path / ".env"
+        app_data_path = settings_service.env_path.parent
         
         # Get current API key
-        from dotenv import dotenv_values
-        env_vars = dotenv_values(env_file_path) if env_file_path.exists() else {}
-        current_api_key = env_vars.get('GEMINI_API_KEY', '') or config.GEMINI_API_KEY
+        current_api_key = get_settings().gemini_api_key
         
         # Get current credentials file
         current_creds_file = None
@@ -2170,6 +2182,7 @@ class EmailSummarizerApp(ctk.CTk):
                 # Reload config module
                 import importlib
                 importlib.reload(config)
+                settings_service.invalidate()
                 
                 # Ask if they want to logout to apply new credentials
                 response = messagebox.askyesno(
@@ -2250,7 +2263,7 @@ class EmailSummarizerApp(ctk.CTk):
                 return
             
             try:
-                flow = InstalledAppFlow.from_client_secrets_file(cred_path, SCOPES)
+                flow = google_oauth_flow.InstalledAppFlow.from_client_secrets_file(cred_path, SCOPES)
                 # Use custom, short-lived local server to capture auth code (non-blocking)
                 # Loop with short 5s checks to detect callback quickly OR browser closure instantly
                 creds = self._fetch_credentials_via_local_server(flow, timeout=5)
@@ -2548,6 +2561,14 @@ class EmailSummarizerApp(ctk.CTk):
         """
         if skip_confirm or messagebox.askyesno("Confirm Logout", "Logout and delete cached session token?"):
             delete_credentials()
+            try:
+                delete_mail_store()
+            except Exception:
+                pass
+            try:
+                clear_summary_cache()
+            except Exception:
+                pass
             self.check_login_status()
             self.clear_emails()
             if not skip_confirm:
@@ -2599,11 +2620,22 @@ class EmailSummarizerApp(ctk.CTk):
             self.open_change_credentials()
     
     def clear_emails(self):
-        for widget in self.email_list_frame.winfo_children():
-            widget.destroy()
-        self.email_items = []
+        self._reset_email_state()
+        self._clear_email_view()
+    
+    def _reset_email_state(self):
+        """Forget all loaded emails (safe to call from worker threads)"""
         self.email_data.clear()
+        self.email_ids = []
+        self.history_id = None
         self.selected_email_id = None
+        self.next_page_token = None
+        self._next_page = None
+        self._load_generation += 1
+    
+    def _clear_email_view(self):
+        """Empty the email list and summary panel (main thread only)"""
+        self.email_list.clear()
         self.summary_text.configure(state="normal", cursor="")
         self.summary_text.delete("1.0", "end")
         self.summary_text.configure(state="disabled")
@@ -2611,215 +2643,578 @@ class EmailSummarizerApp(ctk.CTk):
         self.from_label.configure(text="No email selected")
         self.email_count_display.configure(text="0 emails")
     
+    def _post_progress(self, value=None, text=None):
+        """Queue a status bar update from any thread; only the latest one per frame is drawn"""
+        if value is not None:
+            self.ui.post(lambda: self.progress_bar.set(value), key="progress_bar")
+        if text is not None:
+            self.ui.post(lambda: self.progress_label.configure(text=text), key="progress_label")
+    
+    def _show_summary_text(self, text, markdown=True):
+        """Replace the summary panel contents (main thread only)"""
+        self.summary_text.configure(state="normal", cursor="xterm" if markdown else "")
+        self.summary_text.delete("1.0", "end")
+        if markdown:
+            self.summary_text.insert_markdown("1.0", text)
+        else:
+            self.summary_text.insert("1.0", text)
+        self.summary_text.configure(state="disabled")
+    
     def load_emails_thread(self):
-        thread = threading.Thread(target=self.load_emails, daemon=True)
+        # Read Tk variables here on the main thread; the worker must not touch Tk
+        max_emails = int(self.email_count_var.get())
+        summarize = self.summarize_on_load.get()
+        group_threads = self.group_threads.get()
+        thread = threading.Thread(target=self.load_emails, args=(max_emails, summarize, group_threads), daemon=True)
         thread.start()
     
-    def load_emails(self):
+    def load_emails(self, max_emails, summarize, group_threads=False, background=False):
+        """Load the inbox (runs on a worker thread; UI changes go through self.ui).
+        
+        background=True (the startup sync) reports only in the status bar, without dialogs.
+        """
         try:
             # Check if API key is available BEFORE loading emails
             # Priority: AppData/.env (most recent), then config module (fallback)
-            current_api_key = ""
-            try:
-                app_data_path = Path(os.path.expanduser("~")) / "AppData" / "Roaming" / "ai-email-summarizer"
-                env_file_path = app_data_path / ".env"
-                if env_file_path.exists():
-                    from dotenv import dotenv_values
-                    env_vars = dotenv_values(env_file_path)
-                    current_api_key = env_vars.get('GEMINI_API_KEY', '').strip()
-            except Exception:
-                pass
-            
-            # Fallback to config if not found in AppData
-            if not current_api_key:
-                current_api_key = config.GEMINI_API_KEY.strip() if config.GEMINI_API_KEY else ""
+            current_api_key = get_settings().gemini_api_key
             
             if not current_api_key:
                 # API key is missing - show credentials setup screen instead of just an error
-                self.after(0, lambda: self._handle_missing_api_key_on_load())
-                self.load_btn.configure(state="normal", text="📧 Load Emails")
+                self.ui.post(self._handle_missing_api_key_on_load)
                 return
             
-            self.load_btn.configure(state="disabled", text="⏳ Loading emails...")
-            self.max_emails = int(self.email_count_var.get())
+            self.ui.post(lambda: self.load_btn.configure(state="disabled", text="⏳ Loading emails..."))
+            self.max_emails = max_emails
+            if self.service is None:
+                self.service = self.get_service()
             
-            self.progress_label.configure(text="⏳ Fetching emails from Gmail...")
-            self.progress_bar.set(0)
-            self.update()
+            # Refresh in place when the inbox of the same size is already loaded
+            if (self.history_id and self.email_data and self.max_emails == self.loaded_max_emails
+                    and not group_threads and not self.loaded_threads):
+                if self._sync_emails(summarize):
+                    return
             
-            self.clear_emails()
+            self._post_progress(0, "⏳ Fetching emails from Gmail...")
+            self._reset_email_state()
+            self.loaded_threads = group_threads
+            self.ui.post(self._clear_email_view)
             
-            results = self.service.users().messages().list(
-                userId='me',
-                labelIds=['INBOX'],
-                q="category:primary",
-                maxResults=self.max_emails
-            ).execute()
+            # Remember where this snapshot starts so the next refresh only fetches changes
+            history_id = self.service.users().getProfile(userId='me').execute().get('historyId')
             
-            self.emails = results.get('messages', [])
+            # Only the first page is loaded up front; later pages follow as the list is scrolled
+            self.email_ids, next_page_token = self._list_page(group_threads, self.max_emails)
             
-            if not self.emails:
-                self.progress_label.configure(text="✓ No emails found in Primary")
-                messagebox.showinfo("Info", "No emails found in Primary inbox")
-                self.load_btn.configure(state="normal")
+            if not self.email_ids:
+                self._post_progress(text="✓ No emails found in Primary")
+                self._save_inbox_snapshot()
+                if not background:
+                    self.ui.post(lambda: messagebox.showinfo("Info", "No emails found in Primary inbox"))
                 return
             
-            # Load email metadata without summarizing
-            for idx, email in enumerate(self.emails):
-                msg_id = email['id']
-                subject, sender = get_email_subject(self.service, msg_id)
-                body = get_email_body_raw(self.service, msg_id)
-                
-                self.email_data[msg_id] = {
-                    'subject': subject,
-                    'sender': sender,
-                    'body': body,
-                    'summary': None
-                }
-                
-                # Add to UI
-                item = EmailListItem(
-                    self.email_list_frame,
-                    subject=subject,
-                    sender=sender,
-                    command=lambda eid=msg_id: self.select_email(eid),
-                    fg_color=COLOR_SURFACE,
-                    height=65
-                )
-                item.pack(fill="x", padx=2, pady=2)
-                self.email_items.append((msg_id, item))
-                
-                self.progress_bar.set((idx + 1) / len(self.emails))
-                self.update()
+            count = len(self.email_ids)
+            self.ui.post(lambda: self.email_count_display.configure(text=f"{count} email{'s' if count != 1 else ''}"))
+            ids = list(self.email_ids)
             
-            self.email_count_display.configure(text=f"{len(self.emails)} email{'s' if len(self.emails) != 1 else ''}")
-            self.progress_bar.set(1.0)
-            
-            # If toggle is ON, summarize all emails FIRST before showing anything
-            if self.summarize_on_load.get():
-                self.progress_label.configure(text="⏳ Summarizing all emails...")
-                self._summarize_all_emails()  # Run synchronously to wait for completion
+            if summarize:
+                # Pipeline: Gemini starts on the first emails while the rest are still downloading
+                self._summarize_all_emails(self._fetch_email_chunks(ids, group_threads, config.GMAIL_PIPELINE_BATCH_SIZE))
             else:
-                self.progress_label.configure(text="✓ Emails loaded. Click to summarize.")
+                # Fetch all payloads in HTTP batches (one round-trip per batch) without summarizing
+                for _ in self._fetch_email_chunks(ids, group_threads, len(ids),
+                                                  on_progress=lambda done, total: self._post_progress(done / total)):
+                    pass
+                self._post_progress(1.0, "✓ Emails loaded. Click to summarize.")
             
-            messagebox.showinfo("Success", f"✓ Loaded {len(self.emails)} emails")
+            self.history_id = history_id
+            self.loaded_max_emails = self.max_emails
+            self.next_page_token = next_page_token  # Set last so scrolling can't page in mid-load
+            self._save_inbox_snapshot()
+            self._prefetch_next_page()
+            self.ui.post(self._maybe_load_more)
             
-            if self.emails:
-                self.select_email(self.emails[0]['id'])
+            if not background:
+                self.ui.post(lambda: messagebox.showinfo("Success", f"✓ Loaded {count} emails"))
+            
+            if self.email_ids:
+                first_id = self.email_ids[0]
+                self.ui.post(lambda: self.select_email(first_id))
         
         except Exception as e:
-            self.progress_label.configure(text=f"✗ Error: {str(e)[:40]}")
-            messagebox.showerror("Error", f"Failed to load emails: {str(e)}")
+            error_msg = str(e)
+            self._post_progress(text=f"✗ Error: {error_msg[:40]}")
+            if not background:
+                self.ui.post(lambda: messagebox.showerror("Error", f"Failed to load emails: {error_msg}"))
         
         finally:
-            self.load_btn.configure(state="normal", text="📧 Load Emails")
+            self.ui.post(lambda: self.load_btn.configure(state="normal", text="📧 Load Emails"))
     
-    def select_email(self, email_id):
-        # Deselect previous
-        if self.selected_email_id:
-            for msg_id, item in self.email_items:
-                if msg_id == self.selected_email_id:
-                    item.deselect()
+    def _warm_start(self, summarize):
+        """Show the inbox saved by the last session, then sync it with Gmail (worker thread)"""
+        store = get_mail_store()
+        try:
+            snapshot = store.load_inbox() if store else None
+            records = store.get_many(snapshot['kind'], snapshot['ids']) if snapshot else {}
+        except Exception:
+            return
+        ids = [email_id for email_id in snapshot['ids'] if email_id in records] if snapshot else []
+        if not ids or self.email_data:
+            return  # Nothing saved, or the user has loaded emails already
+        
+        self.loaded_threads = snapshot['kind'] == 'thread'
+        self.email_data.update((email_id, records[email_id]) for email_id in ids)
+        self.email_ids = ids
+        self.history_id = snapshot['history_id']
+        self.loaded_max_emails = max_emails = snapshot['max_emails']
+        group_threads = self.loaded_threads
+        self.ui.post(lambda: self._restore_load_options(max_emails, group_threads))
+        self._refresh_email_list()
+        if not get_settings().gemini_api_key:
+            self._post_progress(1.0, "✓ Showing saved inbox")
+            return
+        first_id = ids[0]
+        self.ui.post(lambda: self.select_email(first_id))
         
-        self.selected_email_id = email_id
+        # Conversations have no incremental sync; they are refreshed with Load Emails
+        if group_threads:
+            self._post_progress(1.0, "✓ Showing saved inbox. Click Load Emails to refresh.")
+            return
+        self._post_progress(1.0, "⏳ Showing saved inbox, checking for new emails...")
+        self.load_emails(max_emails, summarize, background=True)
+    
+    def _restore_load_options(self, max_emails, group_threads):
+        """Set the load controls to match a restored inbox (main thread only)"""
+        self.email_count_var.set(str(max_emails))
+        self.group_threads.set(group_threads)
+    
+    def _save_inbox_snapshot(self):
+        """Remember the inbox for the next startup (safe to call from worker threads)"""
+        store = get_mail_store()
+        if not store:
+            return
+        try:
+            store.save_inbox(self._mail_kind(), self.email_ids,
+                             self.history_id, self.loaded_max_emails)
+        except Exception:
+            pass
+    
+    def _fetch_email_chunks(self, ids, group_threads, step, on_progress=None):
+        """Fetch ids into self.email_data `step` at a time, yielding each chunk's (id, body) pairs.
+        
+        The list grows as chunks arrive. In conversation mode summaries are cached per
+        thread + latest message, so a new reply invalidates the thread's summary.
+        """
+        fetch = fetch_threads_batch if group_threads else fetch_emails_batch
+        for start in range(0, len(ids), step):
+            chunk = ids[start:start + step]
+            fetched = fetch(self.service, chunk, on_progress=on_progress)
+            for email_id in chunk:
+                self.email_data[email_id] = self._email_record(email_id, fetched, group_threads)
+            self._save_to_mail_store(chunk)
+            self._refresh_email_list(keep_scroll=True)
+            yield [(email_id, self.email_data[email_id].body) for email_id in chunk]
+    
+    @staticmethod
+    def _email_record(email_id, fetched, group_threads):
+        """Build the EmailRecord for one id of a fetch_emails_batch / fetch_threads_batch result"""
+        if group_threads:
+            subject, sender, body, latest_id = fetched.get(email_id, ("Error", "Unknown", "", None))
+            cache_id = f"{email_id}:{latest_id}" if latest_id else None
+        else:
+            subject, sender, body = fetched.get(email_id, ("Error", "Unknown", ""))
+            cache_id = None
+        return EmailRecord(subject, sender, body, cache_id=cache_id)
+    
+    def _list_page(self, group_threads, page_size, page_token=None, service=None):
+        """One page of Primary inbox ids (threads in conversation mode) and the next page's token"""
+        service = service or self.service
+        listing = service.users().threads() if group_threads else service.users().messages()
+        results = listing.list(
+            userId='me',
+            labelIds=['INBOX'],
+            q="category:primary",
+            maxResults=page_size,
+            pageToken=page_token
+        ).execute()
+        ids = [entry['id'] for entry in results.get('threads' if group_threads else 'messages', [])]
+        return ids, results.get('nextPageToken')
+    
+    def _fetch_page(self, page_token, group_threads, page_size):
+        """List and download one page without touching the loaded inbox (page executor thread).
+        
+        Uses the worker's own Gmail client, as self.service may be in use by a load
+        or sync on another thread at the same time.
+        """
+        if self._page_service is None:
+            self._page_service = build_gmail_service(load_credentials(), shared=False)
+        service = self._page_service
+        ids, next_token = self._list_page(group_threads, page_size, page_token, service)
+        fetch = fetch_threads_batch if group_threads else fetch_emails_batch
+        fetched = fetch(service, ids) if ids else {}
+        records = {email_id: self._email_record(email_id, fetched, group_threads) for email_id in ids}
+        return ids, records, next_token
+    
+    def _prefetch_next_page(self):
+        """Start downloading the page after the loaded emails (safe to call from worker threads)"""
+        token = self.next_page_token
+        if not token or not self.loaded_max_emails:
+            self._next_page = None
+            return
+        future = self._page_executor.submit(self._fetch_page, token, self.loaded_threads, self.loaded_max_emails)
+        self._next_page = (token, future)
+    
+    def _load_more(self):
+        """Append the next page when the list nears its end (main thread)"""
+        if self._loading_more or not self.next_page_token or self.service is None:
+            return
+        self._loading_more = True
+        summarize = self.summarize_on_load.get()
+        threading.Thread(target=self._load_next_page, args=(summarize,), daemon=True).start()
+    
+    def _load_next_page(self, summarize):
+        """Append the next page of the inbox, taken from the prefetch when it matches (worker thread)"""
+        generation = self._load_generation
+        try:
+            self._post_progress(text="⏳ Loading more emails...")
+            token = self.next_page_token
+            prefetched = self._next_page
+            if prefetched and prefetched[0] == token:
+                future = prefetched[1]
+            else:
+                future = self._page_executor.submit(self._fetch_page, token, self.loaded_threads, self.loaded_max_emails)
+            ids, records, next_token = future.result()
+            if generation != self._load_generation or token != self.next_page_token:
+                return  # The inbox was reloaded or synced meanwhile
+            
+            # New mail shifts the pages, so an id may already be listed from the previous one.
+            # email_data can also hold emails opened from search; those keep their record.
+            listed = set(self.email_ids)
+            new_ids = [email_id for email_id in ids if email_id not in listed]
+            for email_id in new_ids:
+                self.email_data.setdefault(email_id, records[email_id])
+            self.email_ids = self.email_ids + new_ids
+            self.next_page_token = next_token
+            self._prefetch_next_page()
+            self._save_to_mail_store(new_ids)
+            self._save_inbox_snapshot()
+            self._refresh_email_list(keep_scroll=True)
+            self._post_progress(text=f"✓ {len(self.email_ids)} emails loaded")
+            
+            # Keep paging while the end of the list is still on screen
+            self._loading_more = False
+            self.ui.post(self._maybe_load_more)
+            
+            if summarize and new_ids:
+                self._summarize_all_emails()
+        except Exception as e:
+            self._next_page = None  # Retry from scratch on the next scroll
+            self._post_progress(text=f"✗ Error loading more: {str(e)[:40]}")
+        finally:
+            self._loading_more = False
+    
+    def _mail_kind(self):
+        return 'thread' if self.loaded_threads else 'message'
+    
+    def _save_to_mail_store(self, email_ids):
+        """Add loaded emails to the local search index (safe to call from worker threads)"""
+        store = get_mail_store()
+        if not store:
+            return
+        records = []
+        for email_id in email_ids:
+            data = self.email_data.get(email_id)
+            if data and data.body and not data.body.startswith("Error reading email"):
+                records.append((email_id, data.subject, data.sender, data.body, data.cache_id))
+        try:
+            store.put(self._mail_kind(), records)
+        except Exception:
+            pass
+    
+    def _refresh_email_list(self, keep_scroll=False):
+        """Redraw the email list from self.email_ids (safe to call from worker threads)"""
+        self.ui.post(lambda: self._show_email_list(keep_scroll))
+    
+    def _show_email_list(self, keep_scroll=False):
+        """Fill the email list with the inbox, or the search matches (main thread only)"""
+        items = []
+        for email_id in self.email_ids:
+            data = self.email_data.get(email_id)
+            if data:
+                items.append((email_id, data.subject, data.sender))
         
-        # Apply selected styling to the clicked item
-        for msg_id, item in self.email_items:
-            if msg_id == email_id:
-                item.apply_selection_style()
+        if self._search_query:
+            store = get_mail_store()
+            try:
+                matches = store.search(self._mail_kind(), self._search_query) if store else []
+            except Exception:
+                matches = []
+            # Loaded emails keep their inbox order; matches from earlier loads follow, newest first
+            match_ids = {match[0] for match in matches}
+            loaded_ids = {item[0] for item in items}
+            items = [item for item in items if item[0] in match_ids] + [match for match in matches if match[0] not in loaded_ids]
+            count_text = f"{len(items)} match{'es' if len(items) != 1 else ''}"
+        else:
+            count = len(self.email_ids)
+            count_text = f"{count} email{'s' if count != 1 else ''}"
+        
+        self.email_list.set_items(items, keep_scroll=keep_scroll)
+        self.email_count_display.configure(text=count_text)
+    
+    def _on_search_changed(self, event=None):
+        """Debounce the search box so the list is filtered once typing pauses"""
+        if self._search_after_id is not None:
+            self.after_cancel(self._search_after_id)
+        self._search_after_id = self.after(config.SEARCH_DEBOUNCE_MS, self._apply_search)
+    
+    def _apply_search(self):
+        self._search_after_id = None
+        query = self.search_entry.get().strip()
+        if query != self._search_query:
+            self._search_query = query
+            self._show_email_list()
+    
+    def _sync_emails(self, summarize):
+        """Patch the loaded inbox with changes since the last load (Gmail history API).
+        
+        Only newly added messages are downloaded; the list is re-read just when
+        something in the Primary inbox actually changed. Returns False if the stored
+        historyId has expired and a full reload is needed.
+        """
+        self._post_progress(0, "⏳ Checking for new emails...")
+        
+        try:
+            added_ids, removed_ids, history_id = fetch_inbox_changes(self.service, self.history_id)
+        except google_errors.HttpError as e:
+            if e.resp.status == 404:
+                return False
+            raise
+        
+        added_ids = [msg_id for msg_id in added_ids if msg_id not in self.email_data]
+        # A restored inbox has no page token yet; re-listing also finds where the next page starts
+        if not added_ids and not (removed_ids & self.email_data.keys()) and self.next_page_token:
+            self.history_id = history_id
+            self._save_inbox_snapshot()
+            self._post_progress(1.0, "✓ Inbox is up to date")
+            return True
+        
+        # Re-read the (cheap) id list for the current order, then fetch only what is new
+        current_ids, page_token = [], None
+        wanted = max(len(self.email_ids), self.max_emails)  # Keep every page scrolled in so far
+        while len(current_ids) < wanted:
+            page_ids, page_token = self._list_page(False, min(config.GMAIL_LIST_MAX_RESULTS, wanted - len(current_ids)), page_token)
+            current_ids.extend(page_ids)
+            if not page_token:
                 break
+        # Emails that could not be read last time are fetched again too
+        new_ids = [msg_id for msg_id in current_ids
+                   if msg_id not in self.email_data or self.email_data[msg_id].body.startswith("Error reading email")]
+        
+        fetched = fetch_emails_batch(self.service, new_ids) if new_ids else {}
+        for msg_id in new_ids:
+            subject, sender, body = fetched.get(msg_id, ("Error", "Unknown", ""))
+            self.email_data[msg_id] = EmailRecord(subject, sender, body)
+        
+        self._save_to_mail_store(new_ids)
+        
+        # Drop emails that left the inbox
+        removed = 0
+        current = set(current_ids)
+        for msg_id in list(self.email_data):
+            if msg_id not in current:
+                del self.email_data[msg_id]
+                removed += 1
+                if msg_id == self.selected_email_id:
+                    self.selected_email_id = None
+        
+        self.email_ids = current_ids
+        self.next_page_token = page_token
+        self._refresh_email_list(keep_scroll=True)
+        self.history_id = history_id
+        self._save_inbox_snapshot()
+        self._prefetch_next_page()
+        self.ui.post(self._maybe_load_more)
+        count = len(self.email_ids)
+        self.ui.post(lambda: self.email_count_display.configure(text=f"{count} email{'s' if count != 1 else ''}"))
+        self._post_progress(1.0)
+        
+        if new_ids and summarize:
+            self._summarize_all_emails()
+        self._post_progress(text=f"✓ Inbox updated ({len(new_ids)} new, {removed} removed)")
+        
+        if self.selected_email_id is None and self.email_ids:
+            first_id = self.email_ids[0]
+            self.ui.post(lambda: self.select_email(first_id))
+        return True
+    
+    def select_email(self, email_id):
+        self.selected_email_id = email_id
+        
+        # Apply selected styling to the clicked item (and deselect the previous one)
+        self.email_list.select(email_id)
         
         data = self.email_data.get(email_id)
+        if data is None:
+            # Search match from an earlier load: read it back from the local mail store
+            store = get_mail_store()
+            data = store.get(self._mail_kind(), email_id) if store else None
+            if data:
+                self.email_data[email_id] = data
         
         if data:
-            self.subject_label.configure(text=data['subject'])
-            self.from_label.configure(text=data['sender'])
+            self.subject_label.configure(text=data.subject)
+            self.from_label.configure(text=data.sender)
             
             # If summary not yet generated, generate it
-            if data['summary'] is None:
-                self.summary_text.configure(state="normal", cursor="")
-                self.summary_text.delete("1.0", "end")
-                self.summary_text.insert("1.0", "⏳ Generating summary...\n\nPlease wait a few seconds for AI to process your email.")
-                self.summary_text.configure(state="disabled")
-                self.update()
+            if data.summary is None:
+                self._show_summary_text("⏳ Generating summary...\n\nPlease wait a few seconds for AI to process your email.", markdown=False)
                 
-                # Generate summary in background
-                thread = threading.Thread(
-                    target=self._generate_summary,
-                    args=(email_id, data['body']),
-                    daemon=True
-                )
-                thread.start()
+                # Jump the summary queue; only this request may stream into the panel
+                stream_token = object()
+                self._summary_stream_token = stream_token
+                self._generate_summary(email_id, data.body, stream_token, data.cache_id)
             else:
-                self.summary_text.configure(state="normal", cursor="xterm")
-                self.summary_text.delete("1.0", "end")
-                self.summary_text.insert_markdown("1.0", data['summary'])
-                self.summary_text.configure(state="disabled")
-
-    def _summarize_all_emails(self):
-        """Summarize all loaded emails in PARALLEL when toggle is ON"""
-        try:
-            self.progress_label.configure(text="⏳ Summarizing all emails in parallel...")
-            total = len(self.emails)
-            completed = [0]  # Use list to allow modification in nested function
-            
-            def summarize_one(email_entry):
-                """Summarize one email"""
+                self._summary_stream_token = None
+                self._show_summary_text(data.summary)
+    
+    def _on_visible_emails_changed(self, visible_ids):
+        """Summarize rows scrolled into view before off-screen ones (main thread)"""
+        self._visible_email_ids = frozenset(visible_ids)
+        self.summary_scheduler.prioritize(visible_ids, PRIORITY_VISIBLE)
+        
+        self._maybe_load_more()
+    
+    def _maybe_load_more(self):
+        """Infinite scroll: fetch the next page once the last rows are on screen (main thread).
+        
+        Also called after a page is added, since a list shorter than the view
+        cannot be scrolled to trigger it.
+        """
+        if self._search_query or not self._visible_email_ids:
+            return
+        if any(email_id in self._visible_email_ids for email_id in self.email_ids[-config.LOAD_MORE_THRESHOLD_ROWS:]):
+            self._load_more()
+    
+    def _store_summary(self, email_id, summary, error):
+        """Record a finished summary (safe to call from worker threads)"""
+        data = self.email_data.get(email_id)
+        if data is None:
+            return
+        if summary is not None:
+            data.summary = summary
+            # Make the summary searchable too
+            store = get_mail_store()
+            if store and not summary.startswith("Error"):
                 try:
-                    msg_id = email_entry['id']
-                    data = self.email_data.get(msg_id)
-                    
-                    if data and data['summary'] is None:
-                        summary = gemini_summarize_and_reply(data['body'], msg_id)
-                        self.email_data[msg_id]['summary'] = summary
-                    
-                    # Update progress
-                    completed[0] += 1
-                    self.progress_bar.set(completed[0] / total)
-                    self.progress_label.configure(text=f"⏳ Summarizing ({completed[0]}/{total})...")
-                    self.update_idletasks()
-                    
-                except Exception as e:
-                    msg_id = email_entry.get('id', 'unknown')
-                    self.email_data[msg_id]['summary'] = f"Error: {str(e)}"
-            
-            # Use ThreadPoolExecutor to run 4 summaries in parallel
-            with ThreadPoolExecutor(max_workers=4) as executor:
-                futures = [executor.submit(summarize_one, email) for email in self.emails]
-                # Wait for all to complete
-                for future in futures:
-                    future.result()
-            
-            self.progress_label.configure(text="✓ All summaries ready!")
-            # Refresh current selection to show cached summary
-            if self.selected_email_id:
-                data = self.email_data.get(self.selected_email_id)
-                if data and data['summary']:
-                    self.summary_text.configure(state="normal", cursor="xterm")
-                    self.summary_text.delete("1.0", "end")
-                    self.summary_text.insert_markdown("1.0", data['summary'])
-                    self.summary_text.configure(state="disabled")
-        except Exception as e:
-            self.progress_label.configure(text=f"✗ Error summarizing: {str(e)[:40]}")
+                    store.set_summary(self._mail_kind(), email_id, summary)
+                except Exception:
+                    pass
+        elif not isinstance(error, GeminiTransientError):
+            # Transient failures leave the summary unset so selecting the email retries it
+            data.summary = f"Error: {str(error)}"
 
-    def _generate_summary(self, email_id, body):
-        try:
-            summary = gemini_summarize_and_reply(body, email_id)
-            self.email_data[email_id]['summary'] = summary
-            
-            # Update UI if still selected
-            if self.selected_email_id == email_id:
-                self.summary_text.configure(state="normal", cursor="xterm")
-                self.summary_text.delete("1.0", "end")
-                self.summary_text.insert_markdown("1.0", summary)
-                self.summary_text.configure(state="disabled")
-        except Exception as e:
-            error_msg = f"Error generating summary: {str(e)}"
-            if self.selected_email_id == email_id:
-                self.summary_text.configure(state="normal", cursor="")
+    def _summarize_all_emails(self, chunks=None):
+        """Summarize loaded emails in PARALLEL when toggle is ON (runs on a worker thread).
+        
+        chunks optionally yields (id, body) lists while they are being fetched; by
+        default every loaded email without a summary is summarized. Emails go through
+        the summary scheduler, so visible rows and the selected email are served
+        first. Fetch errors raised by chunks propagate to the caller.
+        """
+        self._post_progress(0 if chunks is not None else None, "⏳ Summarizing all emails in parallel...")
+        total = len(self.email_ids)
+        counts = [0, 0]  # Submitted and finished emails (lists allow modification in nested function)
+        counts_cond = threading.Condition()
+        
+        if chunks is None:
+            records = [(email_id, self.email_data.get(email_id)) for email_id in self.email_ids]
+            pending = [(email_id, data.body) for email_id, data in records if data and data.summary is None]
+            already_done = total - len(pending)
+            chunks = [pending]
+        else:
+            already_done = 0
+        
+        def on_done(msg_id, summary, error):
+            self._store_summary(msg_id, summary, error)
+            with counts_cond:
+                counts[1] += 1
+                done = already_done + counts[1]
+                counts_cond.notify_all()
+            # Update progress (coalesced by the UI dispatcher to one redraw per frame)
+            self._post_progress(done / total, f"⏳ Summarizing ({done}/{total})...")
+        
+        # Whole chunks are submitted at once so short emails can share a request;
+        # fetching pauses while the scheduler's backlog is full
+        for items in chunks:
+            self.summary_scheduler.wait_for_room()
+            requests = [
+                SummaryRequest(
+                    msg_id, body, self.email_data[msg_id].cache_id,
+                    PRIORITY_VISIBLE if msg_id in self._visible_email_ids else PRIORITY_BACKGROUND
+                )
+                for msg_id, body in items if msg_id in self.email_data
+            ]
+            with counts_cond:
+                counts[0] += len(requests)
+            self.summary_scheduler.submit(requests, on_done)
+        
+        with counts_cond:
+            counts_cond.wait_for(lambda: counts[1] >= counts[0])
+        
+        self._post_progress(1.0, "✓ All summaries ready!")
+        # Refresh current selection to show cached summary
+        self.ui.post(self._refresh_selected_summary)
+    
+    def _refresh_selected_summary(self):
+        """Redraw the summary of the selected email if it is available (main thread only)"""
+        if self.selected_email_id:
+            data = self.email_data.get(self.selected_email_id)
+            if data and data.summary:
+                self._show_summary_text(data.summary)
+
+    def _generate_summary(self, email_id, body, stream_token=None, cache_id=None):
+        """Queue the selected email's summary ahead of everything else (main thread).
+        
+        If the email is already being summarized (by bulk summarization or an
+        earlier click) this waits for that request instead of sending another.
+        """
+        streamed = []  # Fragments rendered so far (main thread only)
+        
+        def render_fragment(text):
+            if self._summary_stream_token is not stream_token:
+                return  # The user selected another email
+            self.summary_text.configure(state="normal", cursor="xterm")
+            if not streamed:
                 self.summary_text.delete("1.0", "end")
-                self.summary_text.insert("1.0", error_msg)
+                self.summary_text.begin_stream()
+            streamed.append(text)
+            self.summary_text.append_markdown(text)
+            self.summary_text.configure(state="disabled")
+        
+        def show_result(summary, markdown=True):
+            if self._summary_stream_token is not stream_token or self.selected_email_id != email_id:
+                return
+            self._summary_stream_token = None
+            if markdown and streamed and ''.join(streamed) == summary:
+                # Everything is on screen already except the last partial line
+                self.summary_text.configure(state="normal")
+                self.summary_text.end_stream()
                 self.summary_text.configure(state="disabled")
+            else:
+                self._show_summary_text(summary, markdown=markdown)
+        
+        def on_done(msg_id, summary, error):
+            self._store_summary(msg_id, summary, error)
+            if summary is not None:
+                self.ui.post(lambda: show_result(summary))
+            else:
+                error_msg = f"Error generating summary: {str(error)}"
+                self.ui.post(lambda: show_result(error_msg, markdown=False))
+        
+        self.summary_scheduler.submit(
+            [SummaryRequest(email_id, body, cache_id, PRIORITY_SELECTED)],
+            on_done,
+            on_partial=lambda text: self.ui.post(lambda: render_fragment(text))
+        )
 
 # ========== RUN APP ==========
 if __name__ == "__main__":
@@ -0,0 +1,143 @@
+"""
+Micro-benchmark for the HTML-to-text converter (email_core.HtmlToText).
+
+Compares it with the HTMLParser-based MLStripper the app used before, on the demo
+emails rendered as HTML (demo_data.DEMO_EMAILS) and on synthetic newsletters up to
+several megabytes, and times extract_email_body on an HTML-only message to show
+that the streamed reader stops at its character budget:
+
+    python benchmarks/bench_html_to_text.py
+    python benchmarks/bench_html_to_text.py --repeat 20 --sizes 50000 500000
+"""
+
+import argparse
+import base64
+import html
+import os
+import sys
+import time
+from html.parser import HTMLParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import demo_data
+from email_core import extract_email_body, strip_html_tags
+
+
+class MLStripper(HTMLParser):
+    """The converter the app used before HtmlToText (kept here as the baseline)"""
+
+    def __init__(self):
+        super().__init__()
+        self.reset()
+        self.strict = False
+        self.convert_charrefs = True
+        self.text = []
+        self.current_link = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            for attr, value in attrs:
+                if attr == 'href':
+                    self.current_link = value
+                    break
+
+    def handle_endtag(self, tag):
+        if tag == 'a' and self.current_link:
+            self.text.append(f' ({self.current_link})')
+            self.current_link = None
+
+    def handle_data(self, d):
+        self.text.append(d)
+
+    def get_data(self):
+        return ''.join(self.text)
+
+
+def baseline_strip_html_tags(markup):
+    stripper = MLStripper()
+    stripper.feed(markup)
+    return stripper.get_data()
+
+
+def demo_html(email):
+    """A demo email as the HTML part a mail client would send"""
+    paragraphs = ''.join(f"<p>{html.escape(paragraph)}</p>\n" for paragraph in email['body'].split('\n\n'))
+    return (
+        "<html><head><meta charset='utf-8'><style>p { margin: 0 0 12px; }</style></head>"
+        f"<body><div class='content'><h2>{html.escape(email['subject'])}</h2>{paragraphs}"
+        "<a href='https://example.com/unsubscribe?utm_source=newsletter'>Unsubscribe</a></div></body></html>"
+    )
+
+
+def newsletter_html(size):
+    """A table-layout newsletter of about size characters with tracking links and inline styles"""
+    head = (
+        "<html><head><meta charset='utf-8'><title>Weekly digest</title><style>"
+        + "td { font-family: Arial; padding: 4px; } " * 50
+        + "</style></head><body><table width='600'>"
+    )
+    row = (
+        "<tr><td style='padding:12px;color:#333'><h3>Story headline goes here</h3>"
+        "<p>Some teaser text for the story, long enough to look like a real paragraph &amp; more.</p>"
+        "<a href='https://news.example.com/story?id=%d&utm_source=mail&utm_campaign=weekly'>Read more</a>"
+        "</td></tr>\n"
+    )
+    rows = []
+    length = len(head)
+    index = 0
+    while length < size:
+        rows.append(row % index)
+        length += len(rows[-1])
+        index += 1
+    return head + ''.join(rows) + "</table></body></html>"
+
+
+def html_only_message(markup):
+    """Gmail message resource with a single text/html part"""
+    return {
+        'payload': {
+            'mimeType': 'text/html',
+            'headers': [{'name': 'Content-Type', 'value': 'text/html; charset=utf-8'}],
+            'body': {'data': base64.urlsafe_b64encode(markup.encode('utf-8')).decode('ascii')},
+        }
+    }
+
+
+def best_of(repeat, fn, *args):
+    """Fastest of repeat runs, in milliseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the HTML-to-text converter against the old MLStripper.")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per case; the fastest is reported (default: %(default)s)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000, 4_000_000],
+                        help="synthetic newsletter sizes in characters (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    cases = [(f"demo {index + 1}", demo_html(email)) for index, email in enumerate(demo_data.DEMO_EMAILS)]
+    cases += [(f"newsletter {size // 1000} KB", newsletter_html(size)) for size in args.sizes]
+
+    print(f"{'case':<22}{'chars':>10}{'MLStripper ms':>16}{'HtmlToText ms':>16}{'speedup':>10}")
+    for name, markup in cases:
+        baseline = best_of(args.repeat, baseline_strip_html_tags, markup)
+        current = best_of(args.repeat, strip_html_tags, markup)
+        print(f"{name:<22}{len(markup):>10}{baseline:>16.2f}{current:>16.2f}{baseline / current:>9.1f}x")
+
+    print()
+    print("extract_email_body on an HTML-only message (streamed, stops at EMAIL_BODY_READ_CHARS):")
+    for size in args.sizes:
+        message = html_only_message(newsletter_html(size))
+        elapsed = best_of(args.repeat, extract_email_body, message)
+        body = extract_email_body(message)
+        print(f"  {size // 1000:>6} KB: {elapsed:8.2f} ms, {len(body)} chars of text")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Startup import benchmark: how long the modules loaded before the main window is
+interactive take to import, measured with python -X importtime.
+
+The module list mirrors app.py's splash loader and top-level imports. Heavy
+libraries that are meant to load lazily (Google clients, requests, aiohttp)
+must not show up; the script exits with status 1 if one does.
+
+Each run can be appended to a JSONL history, keyed by git revision, so the number
+can be tracked across releases and compared with the previous record:
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10 --record benchmarks/startup_history.jsonl
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported before the main window can respond (see show_splash_and_load in app.py)
+STARTUP_MODULES = [
+    'tkinter', 'tkinter.ttk', 'customtkinter', 'tkinter.messagebox', 'tkinter.filedialog',
+    'threading', 'concurrent.futures', 'json', 're', 'pathlib', 'webbrowser',
+    'http.server', 'urllib.parse', 'config', 'email_core',
+]
+# Loaded on first use or on a background thread, never during startup
+# (PIL is not listed: customtkinter imports it itself)
+LAZY_MODULES = ['googleapiclient', 'google_auth_oauthlib', 'google.oauth2', 'requests', 'aiohttp']
+
+
+def available_modules():
+    sys.path.insert(0, ROOT)
+    try:
+        return [name for name in STARTUP_MODULES if importlib.util.find_spec(name.split('.')[0]) is not None]
+    finally:
+        sys.path.remove(ROOT)
+
+
+def measure(modules):
+    """One cold interpreter run: (total import microseconds, {module: cumulative us}, wall seconds)"""
+    code = "import " + ", ".join(modules)
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    wall = time.perf_counter() - start
+    cumulative = {}
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "cumulative" in line:
+            continue
+        _, cumulative_us, package = line[len("import time:"):].split("|")
+        name = package.rstrip()
+        cumulative[name.strip()] = int(cumulative_us)
+        if not name.startswith("  "):  # top-level import
+            total += int(cumulative_us)
+    return total, cumulative, wall
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the import time of the app's startup modules.")
+    parser.add_argument("--runs", type=int, default=5, help="cold interpreter runs; the median is reported (default: %(default)s)")
+    parser.add_argument("--top", type=int, default=10, help="slowest modules to list (default: %(default)s)")
+    parser.add_argument("--record", help="JSONL file to append this result to and compare with its last entry")
+    args = parser.parse_args(argv)
+
+    modules = available_modules()
+    skipped = [name for name in STARTUP_MODULES if name not in modules]
+    if skipped:
+        print(f"Not installed, skipped: {', '.join(skipped)}")
+
+    runs = [measure(modules) for _ in range(args.runs)]
+    total_ms = statistics.median(run[0] for run in runs) / 1000
+    wall_ms = statistics.median(run[2] for run in runs) * 1000
+    cumulative = runs[-1][1]
+
+    print(f"Startup imports: {total_ms:.1f} ms (median of {args.runs}; interpreter wall time {wall_ms:.1f} ms)")
+    print("Slowest top-level imports:")
+    for name in sorted(modules, key=lambda name: -cumulative.get(name, 0))[:args.top]:
+        print(f"  {name:<22}{cumulative.get(name, 0) / 1000:>8.1f} ms")
+
+    loaded_lazy = [name for name in LAZY_MODULES if name in cumulative]
+    if loaded_lazy:
+        print(f"Loaded during startup but meant to be lazy: {', '.join(loaded_lazy)}")
+
+    if args.record:
+        record = {
+            "revision": git_revision(),
+            "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": sys.version.split()[0],
+            "import_ms": round(total_ms, 1),
+            "wall_ms": round(wall_ms, 1),
+            "skipped": skipped,
+        }
+        previous = None
+        if os.path.exists(args.record):
+            with open(args.record, encoding="utf-8") as f:
+                lines = [line for line in f if line.strip()]
+            if lines:
+                previous = json.loads(lines[-1])
+        if previous:
+            change = record["import_ms"] - previous["import_ms"]
+            print(f"Previous record ({previous['revision']}, {previous['date']}): "
+                  f"{previous['import_ms']:.1f} ms, change {change:+.1f} ms")
+        with open(args.record, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+    return 1 if loaded_lazy else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -19,4 +19,66 @@ GMAIL_SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
 GMAIL_TOKEN_CACHE = 'token.pkl'
 
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', '')
-GEMINI_ENDPOINT = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent"
\ No newline at end of file
+GEMINI_ENDPOINT = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent"
+# Gmail HTTP batch requests accept at most 100 calls per batch, but Google advises at most
+# 50: larger batches of format='full' gets hit the per-user concurrent request limit (429)
+GMAIL_BATCH_SIZE = 50
+# Calls of a batch that failed with 429/5xx are sent again in follow-up batches, with
+# exponential backoff (seconds, capped)
+GMAIL_BATCH_MAX_RETRIES = 4
+GMAIL_MAX_BACKOFF = 16
+
+# Persistent summary cache, stored in the app data folder
+SUMMARY_CACHE_FILE = 'summary_cache.db'
+SUMMARY_CACHE_MAX_ENTRIES = 2000
+
+# Gemini HTTP client: parallel requests (connection pool and worker count) and timeouts in seconds
+GEMINI_CONCURRENCY = 4
+GEMINI_CONNECT_TIMEOUT = 10
+GEMINI_READ_TIMEOUT = 120
+
+# Gemini rate limiting: sustained request rate shared by all workers, retries for 429/5xx
+# responses and the longest single backoff (seconds) before giving up
+GEMINI_REQUESTS_PER_MINUTE = 60
+GEMINI_MAX_RETRIES = 5
+GEMINI_MAX_BACKOFF = 60
+
+# Stream summaries (Server-Sent Events) so the first lines show up while the rest is generated
+GEMINI_STREAMING = True
+GEMINI_STREAM_ENDPOINT = GEMINI_ENDPOINT.replace(":generateContent", ":streamGenerateContent")
+
+# Bulk summaries run on an asyncio engine when aiohttp is installed (optional); it can keep
+# more requests in flight than the thread pool, still within GEMINI_REQUESTS_PER_MINUTE
+GEMINI_ASYNC_CONCURRENCY = 16
+
+# Bulk summarization packs short emails into one request: input token budget per request,
+# largest email (in tokens) that may share a request, and emails per request
+GEMINI_BATCH_TOKEN_BUDGET = 6000
+GEMINI_BATCH_MAX_EMAIL_TOKENS = 800
+GEMINI_BATCH_MAX_EMAILS = 6
+
+# Email body text read from each message (decoding stops here), and the Gemini input
+# budget (tokens, about 4 characters each) it is compacted to after removing quoted
+# replies, signatures and footers
+EMAIL_BODY_READ_CHARS = 20000
+EMAIL_BODY_TOKEN_BUDGET = 1250
+
+# Conversation mode: Gemini input budget (tokens) for a whole thread
+THREAD_BODY_TOKEN_BUDGET = 3000
+
+# With "summarize on load", messages are fetched in smaller HTTP batches so Gemini can
+# start on the first ones while the rest are still downloading
+GMAIL_PIPELINE_BATCH_SIZE = 10
+# The inbox is loaded one page (the "Load Mails" count) at a time; the next page is
+# prefetched and appended when the list is scrolled within this many rows of its end
+LOAD_MORE_THRESHOLD_ROWS = 5
+# messages().list / threads().list return at most 500 ids per page
+GMAIL_LIST_MAX_RESULTS = 500
+
+# Local mailbox copy for offline search (app data folder): the oldest emails beyond the
+# limit are dropped; the search box waits this long (ms) after the last keystroke and
+# lists at most this many matches, newest first
+MAIL_STORE_FILE = 'mailbox.db'
+MAIL_STORE_MAX_EMAILS = 50000
+SEARCH_DEBOUNCE_MS = 150
+SEARCH_MAX_RESULTS = 1000
@@ -0,0 +1,2225 @@
+"""
+Core email pipeline for AI Email Summarizer Pro.
+
+Gmail fetching and parsing, the summary cache and the Gemini client live here so they
+can run without a display: app.py builds the desktop UI on top of this module and
+summarize.py drives it from the command line.
+"""
+
+import os
+import sys
+import pickle
+import json
+import base64
+import hashlib
+import sqlite3
+import zlib
+import time
+import random
+import threading
+import queue
+import heapq
+import itertools
+import asyncio
+import atexit
+import concurrent.futures
+import importlib
+import importlib.util
+import codecs
+import re
+from collections import namedtuple
+from types import MappingProxyType
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import html
+from pathlib import Path
+
+import config
+from config import GMAIL_TOKEN_CACHE as TOKEN_CACHE_FILE, GEMINI_ENDPOINT
+
+# ========== DEFERRED IMPORTS ==========
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access.
+    
+    The Google client libraries and requests take a large share of startup time,
+    so they are only loaded when Gmail or Gemini is first used (or by prewarm_imports).
+    """
+    
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+    
+    def load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+    
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+requests = LazyModule('requests')
+google_discovery = LazyModule('googleapiclient.discovery')
+google_errors = LazyModule('googleapiclient.errors')
+google_oauth_flow = LazyModule('google_auth_oauthlib.flow')
+aiohttp = LazyModule('aiohttp')  # optional, see async_engine_available()
+
+def prewarm_imports():
+    """Load the deferred network libraries (call from a background thread once the UI is up)"""
+    for module in (requests, google_discovery, google_errors, google_oauth_flow, aiohttp):
+        try:
+            module.load()
+        except ImportError:
+            pass
+
+# ========== SETTINGS ==========
+# Per-user settings folder written by the setup screen (.env, OAuth client file, caches)
+APP_DATA_DIR = Path(os.path.expanduser("~")) / "AppData" / "Roaming" / "ai-email-summarizer"
+
+# Immutable view of the current settings; env holds the raw values read from .env
+Settings = namedtuple('Settings', ['gemini_api_key', 'env'])
+
+class SettingsService:
+    """Loads the settings .env once and re-reads it only when the file changes.
+    
+    Every call to get() costs a single stat(); the file is parsed again only when
+    its modification time or size differs from the last load. The returned
+    Settings snapshot is shared between threads and never modified.
+    """
+    
+    def __init__(self, env_path):
+        self.env_path = Path(env_path)
+        self._lock = threading.Lock()
+        self._state = None  # (file stamp, Settings) of the last load
+    
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.env_path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+    
+    def _load(self):
+        env = {}
+        try:
+            if self.env_path.exists():
+                from dotenv import dotenv_values
+                env = {key: value for key, value in dotenv_values(self.env_path).items() if value is not None}
+        except Exception:
+            pass
+        
+        # Fallback to config if not found in AppData
+        api_key = env.get('GEMINI_API_KEY', '').strip()
+        if not api_key:
+            api_key = config.GEMINI_API_KEY.strip() if config.GEMINI_API_KEY else ""
+        return Settings(api_key, MappingProxyType(env))
+    
+    def get(self):
+        stamp = self._file_stamp()
+        state = self._state
+        if state is not None and state[0] == stamp:
+            return state[1]
+        with self._lock:
+            if self._state is None or self._state[0] != stamp:
+                self._state = (stamp, self._load())
+            return self._state[1]
+    
+    def invalidate(self):
+        """Force a reload on the next get() (e.g. after config.py values were changed in place)"""
+        self._state = None
+
+settings_service = SettingsService(APP_DATA_DIR / ".env")
+
+def get_settings():
+    """Current settings snapshot (AppData/.env first, config module as fallback)"""
+    return settings_service.get()
+
+# ========== CREDENTIALS ==========
+def save_credentials(creds, path=None):
+    with open(path or TOKEN_CACHE_FILE, 'wb') as token:
+        pickle.dump(creds, token)
+
+def load_credentials(path=None):
+    path = path or TOKEN_CACHE_FILE
+    if os.path.exists(path):
+        with open(path, 'rb') as token:
+            return pickle.load(token)
+    return None
+
+def delete_credentials():
+    clear_gmail_services()
+    if os.path.exists(TOKEN_CACHE_FILE):
+        os.remove(TOKEN_CACHE_FILE)
+        return True
+    return False
+
+def is_logged_in():
+    return os.path.exists(TOKEN_CACHE_FILE)
+
+# ========== GMAIL SERVICE ==========
+_gmail_services = {}
+_gmail_services_lock = threading.Lock()
+
+def build_gmail_service(creds, shared=True):
+    """Gmail API client for these credentials, built once and reused.
+    
+    The client is built from the discovery document bundled with
+    google-api-python-client (static_discovery) instead of downloading it, and the
+    on-disk discovery cache is skipped, so no network round-trip is needed.
+    Services are memoized per OAuth client and refresh token, so logging in again
+    with the same account returns the existing client. Credentials without a
+    refresh token cannot be told apart by account, so they are memoized per object.
+    
+    A client's HTTP connection (httplib2) is not thread-safe: a thread that calls
+    Gmail alongside others should pass shared=False to get its own client.
+    """
+    if not shared:
+        return google_discovery.build(
+            'gmail', 'v1', credentials=creds, static_discovery=True, cache_discovery=False
+        )
+    refresh_token = getattr(creds, 'refresh_token', None)
+    key = (getattr(creds, 'client_id', None), refresh_token) if refresh_token else id(creds)
+    with _gmail_services_lock:
+        cached = _gmail_services.get(key)
+        # An id() can be reused by a new object once the old one is gone
+        if cached is not None and (refresh_token or cached[0] is creds):
+            return cached[1]
+        service = google_discovery.build(
+            'gmail', 'v1', credentials=creds, static_discovery=True, cache_discovery=False
+        )
+        _gmail_services[key] = (creds, service)
+        return service
+
+def clear_gmail_services():
+    """Forget every memoized Gmail client (on logout, so no client outlives its account)"""
+    with _gmail_services_lock:
+        _gmail_services.clear()
+
+# ========== EMAIL UTILS ==========
+# Elements whose content is never visible text
+HTML_SKIP_TAGS = ('script', 'style', 'head', 'title', 'noscript', 'template', 'svg')
+# Skipped elements that also end where <body> starts, as </head> may be omitted
+HTML_BODY_ENDED_TAGS = ('head', 'title')
+# Elements that start a new line in the text output
+HTML_BLOCK_TAGS = (
+    'p', 'div', 'br', 'tr', 'table', 'ul', 'ol', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'blockquote', 'section', 'article', 'header', 'footer', 'hr', 'pre', 'center', 'dl', 'dt', 'dd'
+)
+
+def _html_patterns(pattern, flags=0):
+    """Compile a markup pattern case-sensitively (fast path for lowercase tags) and case-insensitively"""
+    return re.compile(pattern, flags), re.compile(pattern, flags | re.IGNORECASE)
+
+_HTML_SKIP_ELEMENT = _html_patterns(
+    r'<(%s)\b[^>]*>.*?</\1\s*>|<(%s)\b[^>]*>.*?(?:</\2\s*>|(?=<body\b))|<!--.*?-->' % (
+        '|'.join(tag for tag in HTML_SKIP_TAGS if tag not in HTML_BODY_ENDED_TAGS), '|'.join(HTML_BODY_ENDED_TAGS)),
+    re.DOTALL)
+_HTML_LINK = _html_patterns(r'<a\b([^>]*)>(.*?)</a\s*>', re.DOTALL)
+_HTML_LIST_ITEM = _html_patterns(r'<li\b[^>]*>')
+_HTML_BLOCK = _html_patterns(r'</?(?:%s|li)\b[^>]*>' % '|'.join(HTML_BLOCK_TAGS))
+_HTML_CELL = _html_patterns(r'</?t[dh]\b[^>]*>')
+_HTML_ANY_TAG = re.compile(r'<[!?/]?[a-zA-Z][^>]*>')
+_HTML_UPPERCASE_TAG = re.compile(r'</?[A-Z]')
+_HTML_SKIP_OPEN = re.compile(r'<(%s)\b|<!--' % '|'.join(HTML_SKIP_TAGS), re.IGNORECASE)
+_HTML_LINK_OPEN = re.compile(r'<a\b', re.IGNORECASE)
+_HTML_LINK_CLOSE = re.compile(r'</a\s*>', re.IGNORECASE)
+_HTML_HREF = re.compile(r'''href\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))''', re.IGNORECASE)
+_EXTRA_SPACES = re.compile(r' {2,}')
+_LINE_SPACES = re.compile(r' *\n[ \n]*')
+
+class HtmlToText:
+    """Fast HTML-to-text converter for email bodies.
+    
+    Works with a few regular-expression passes over each piece of markup instead
+    of a per-tag parser callback: script/style/head content and comments are
+    dropped, whitespace is collapsed, block elements become line breaks and list
+    items bullets, and each link target is appended once after its text as
+    " (url)", so repeated tracking links do not bloat the prompt.
+    
+    HTML can be fed in pieces; length is the number of characters produced so
+    far, so callers can stop feeding once they have enough text.
+    """
+    
+    def __init__(self):
+        self.text = []
+        self.length = 0
+        self._buffer = ""
+        self._seen_links = set()
+    
+    def _link(self, match):
+        href = _HTML_HREF.search(match.group(1))
+        if not href:
+            return match.group(2)
+        url = html.unescape(next(group for group in href.groups() if group is not None)).strip()
+        if not url.startswith(('http://', 'https://', 'mailto:')) or url in self._seen_links:
+            return match.group(2)
+        self._seen_links.add(url)
+        return f"{match.group(2)} ({url})"
+    
+    def _convert(self, markup):
+        """Append the text of a piece of markup that contains no unfinished element"""
+        if not markup:
+            return
+        case = 1 if _HTML_UPPERCASE_TAG.search(markup) else 0
+        markup = _HTML_SKIP_ELEMENT[case].sub('', markup)
+        
+        # Collapse whitespace, remembering whether the piece started or ended with some
+        leading = markup[:1].isspace()
+        trailing = markup[-1:].isspace()
+        markup = ' '.join(markup.split())
+        
+        if '<' in markup:
+            markup = _HTML_LINK[case].sub(self._link, markup)
+            markup = _HTML_LIST_ITEM[case].sub('\n* ', markup)
+            markup = _HTML_BLOCK[case].sub('\n', markup)
+            markup = _HTML_CELL[case].sub(' ', markup)
+            markup = _HTML_ANY_TAG.sub('', markup)
+        if '&' in markup:
+            markup = html.unescape(markup).replace('\xa0', ' ')
+        markup = (' ' if leading else '') + markup + (' ' if trailing and markup else '')
+        if markup:
+            self.text.append(markup)
+            self.length += len(markup)
+    
+    def _complete_end(self, buffer, final=False):
+        """End of the part of buffer that can be converted now.
+        
+        Stops before a skipped element or comment whose end has not arrived yet,
+        and (unless final) before the last unfinished tag or still-open link.
+        """
+        limit = len(buffer) if final else buffer.rfind('>') + 1
+        position = 0
+        while True:
+            opening = _HTML_SKIP_OPEN.search(buffer, position, limit)
+            if not opening:
+                break
+            if opening.group(1):
+                tag = opening.group(1).lower()
+                closing_pattern = r'</%s\s*>' % tag + (r'|(?=<body\b)' if tag in HTML_BODY_ENDED_TAGS else '')
+                closing = re.compile(closing_pattern, re.IGNORECASE).search(buffer, opening.end(), limit)
+                end = closing.end() if closing else -1
+            else:
+                end = buffer.find('-->', opening.end(), limit)
+                end = end + 3 if end >= 0 else -1
+            if end < 0:
+                return opening.start()
+            position = end
+        if not final:
+            link = None
+            for link in _HTML_LINK_OPEN.finditer(buffer, position, limit):
+                pass
+            if link and not _HTML_LINK_CLOSE.search(buffer, link.end(), limit):
+                return link.start()
+        return limit
+    
+    def feed(self, data):
+        buffer = self._buffer + data
+        end = self._complete_end(buffer)
+        self._convert(buffer[:end])
+        self._buffer = buffer[end:]
+    
+    def close(self):
+        # An element still open at the end is dropped if it is a skipped one
+        buffer, self._buffer = self._buffer, ""
+        self._convert(buffer[:self._complete_end(buffer, final=True)])
+    
+    def get_data(self):
+        text = ''.join(self.text)
+        text = _EXTRA_SPACES.sub(' ', text)
+        return _LINE_SPACES.sub('\n', text).strip()
+
+def strip_html_tags(html_text):
+    """Visible text of an HTML document.
+    
+    >>> strip_html_tags("<html><head><meta charset='utf-8'><body><p>Hello</p></body></html>")
+    'Hello'
+    """
+    converter = HtmlToText()
+    converter.feed(html_text)
+    converter.close()
+    return converter.get_data()
+
+def parse_email_headers(message):
+    """Get email subject and sender from a Gmail message resource"""
+    headers = message.get('payload', {}).get('headers', [])
+    subject = next((h['value'] for h in headers if h.get('name') == 'Subject'), "No Subject")
+    sender = next((h['value'] for h in headers if h.get('name') == 'From'), "Unknown")
+    return subject, sender
+
+# base64 characters decoded per step when reading a body part (must be a multiple of 4)
+BODY_DECODE_CHUNK = 16 * 1024
+
+def part_charset(part):
+    """Charset declared in a MIME part's Content-Type header (utf-8 if missing or unknown)"""
+    for header in part.get('headers', []):
+        if header.get('name', '').lower() == 'content-type':
+            match = re.search(r'charset\s*=\s*"?([^";\s]+)', header.get('value', ''), re.IGNORECASE)
+            if match:
+                try:
+                    return codecs.lookup(match.group(1)).name
+                except LookupError:
+                    pass
+    return 'utf-8'
+
+def iter_part_text(part, chunk_size=BODY_DECODE_CHUNK):
+    """Decode a MIME part's body.data piece by piece, yielding text in its declared charset"""
+    data = part.get('body', {}).get('data', '')
+    decoder = codecs.getincrementaldecoder(part_charset(part))(errors='replace')
+    for start in range(0, len(data), chunk_size):
+        chunk = data[start:start + chunk_size]
+        final = start + chunk_size >= len(data)
+        if final:
+            chunk += '=' * (-len(chunk) % 4)  # Gmail sometimes omits base64 padding
+        yield decoder.decode(base64.urlsafe_b64decode(chunk), final=final)
+
+def find_body_parts(payload):
+    """First text/plain and text/html parts with data in a message payload (depth-first)"""
+    text_part = None
+    html_part = None
+    stack = [payload]
+    while stack:
+        part = stack.pop()
+        if part.get('parts'):
+            stack.extend(reversed(part['parts']))
+            continue
+        if not part.get('body', {}).get('data'):
+            continue
+        mime_type = part.get('mimeType', '')
+        if mime_type == 'text/html' and html_part is None:
+            html_part = part
+        elif mime_type == 'text/plain' and text_part is None:
+            text_part = part
+    
+    # Single-part message of another type: read the payload as plain text
+    if text_part is None and html_part is None and not payload.get('parts') and payload.get('body', {}).get('data'):
+        text_part = payload
+    return text_part, html_part
+
+def read_part_text(part, max_chars, html=False):
+    """Decode (and for HTML, strip) a part, stopping once max_chars of text are collected"""
+    if html:
+        converter = HtmlToText()
+        for text in iter_part_text(part):
+            converter.feed(text)
+            if converter.length >= max_chars:
+                break
+        else:
+            converter.close()
+        return converter.get_data()[:max_chars]
+    
+    pieces = []
+    length = 0
+    for text in iter_part_text(part):
+        pieces.append(text)
+        length += len(text)
+        if length >= max_chars:
+            break
+    return ''.join(pieces)[:max_chars]
+
+def extract_email_body(message, max_chars=None, max_tokens=None):
+    """Extract the email body/content with links from a Gmail message resource (format='full').
+    
+    Only as much of the chosen part is decoded as is needed to fill max_chars
+    (config.EMAIL_BODY_READ_CHARS by default), so a multi-megabyte newsletter costs
+    about the same as a short email. The text is then compacted to max_tokens
+    (config.EMAIL_BODY_TOKEN_BUDGET) with compact_email_body.
+    """
+    max_chars = max_chars or config.EMAIL_BODY_READ_CHARS
+    text_part, html_part = find_body_parts(message.get('payload', {}))
+    
+    # Prefer HTML to extract links, fallback to text
+    body = ""
+    if html_part:
+        body = read_part_text(html_part, max_chars, html=True)
+    if not body and text_part:
+        body = read_part_text(text_part, max_chars)
+    return compact_email_body(body, max_tokens or config.EMAIL_BODY_TOKEN_BUDGET)
+
+# ========== BODY COMPACTION ==========
+# Query parameters that only identify the campaign or recipient for click tracking
+TRACKING_PARAM = re.compile(
+    r'^(utm_\w+|fbclid|gclid|dclid|gbraid|wbraid|msclkid|yclid|igshid|mc_cid|mc_eid|_hsenc|_hsmi|'
+    r'mkt_tok|vero_id|oly_anon_id|oly_enc_id|ref_src|trk|trkid|trk_\w+|s_cid|sc_cid|ncid)$',
+    re.IGNORECASE
+)
+_URL = re.compile(r'''https?://[^\s<>()"']+''')
+
+# Start of a quoted reply chain; everything from here on is history the sender replied to
+_REPLY_HEADER = re.compile(
+    r'^(?:On\b[^\n]{0,200}(?:\n[^\n]{0,200})?\bwrote:[ \t]*$'
+    r'|-{2,}[ \t]*Original Message[ \t]*-{2,}'
+    r'|_{10,}[ \t]*\n(?:From|De|Von):'
+    r'|From:[^\n]*\n(?:[^\n]*\n){0,2}?(?:Sent|Date):[^\n]*\n(?:[^\n]*\n){0,2}?(?:To|Subject):)',
+    re.MULTILINE | re.IGNORECASE
+)
+# A reply attribution ("On ... wrote:") names a date, time or address; plain prose does not
+_ATTRIBUTION_DETAIL = re.compile(r'\b(?:19|20)\d\d\b|\d:\d\d|@')
+# Line above the header block of a forwarded message, whose content must be kept
+_FORWARD_MARKER = re.compile(r'^[ \t]*(?:-{2,}[ \t]*Forwarded message[ \t]*-{2,}|Begin forwarded message:)[ \t]*$', re.IGNORECASE)
+_QUOTED_LINE = re.compile(r'^[ \t]*>[^\n]*\n?', re.MULTILINE)
+# "-- " signature delimiter and mobile client signatures
+_SIGNATURE = re.compile(r'^--[ \t]?$|^(?:Sent from my |Get Outlook for )[^\n]*$', re.MULTILINE)
+# Boilerplate lines typical of legal footers and mailing list trailers
+_FOOTER_LINE = re.compile(
+    r'confidential|privileged|intended recipient|disclaimer|unsubscribe|you are receiving this|'
+    r'you received this|privacy policy|all rights reserved|\u00a9|\(c\) \d{4}|'
+    r'manage (?:your )?(?:preferences|subscription)|view (?:this email |it )?in (?:your |a )?browser|'
+    r'update (?:your )?(?:email )?preferences|no longer wish to receive',
+    re.IGNORECASE
+)
+# Links that only manage the subscription or track the click
+_FOOTER_URL = re.compile(r'unsubscribe|opt-?out|preferences|list-manage|/track(?:ing)?/|/click', re.IGNORECASE)
+
+def clean_tracking_url(url):
+    """Drop click-tracking query parameters (utm_*, fbclid, ...) from a URL"""
+    parts = urlsplit(url)
+    if not parts.query:
+        return url
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    kept = [(key, value) for key, value in query if not TRACKING_PARAM.match(key)]
+    if len(kept) == len(query):
+        return url
+    return urlunsplit(parts._replace(query=urlencode(kept)))
+
+def _find_reply_header(text):
+    """Start of the quoted reply chain in text.
+    
+    Skips prose that merely reads "On ... wrote:" and the header block of a
+    forwarded message, which is the content the sender wants handled.
+    """
+    for match in _REPLY_HEADER.finditer(text):
+        header = match.group(0)
+        if header[:2].lower() == 'on' and not _ATTRIBUTION_DETAIL.search(header):
+            continue
+        previous_line = text[:match.start()].rstrip().rpartition('\n')[2]
+        if _FORWARD_MARKER.match(previous_line):
+            continue
+        return match
+    return None
+
+def _trim_footer(text):
+    """Drop the trailing run of boilerplate in the last third of text.
+    
+    Bare-link lines in that run go only when they are unsubscribe/tracking links
+    or sit next to a boilerplate line, and the last remaining link is always kept.
+    """
+    lines = text.split('\n')
+    is_boilerplate = [bool(_FOOTER_LINE.search(line)) for line in lines]
+    
+    def next_to_boilerplate(index):
+        for step in (-1, 1):
+            neighbour = index + step
+            while 0 <= neighbour < len(lines) and not lines[neighbour].strip():
+                neighbour += step
+            if 0 <= neighbour < len(lines) and is_boilerplate[neighbour]:
+                return True
+        return False
+    
+    links_left = len(_URL.findall(text))
+    keep = len(lines)
+    footer_limit = len(lines) * 2 // 3
+    while keep > footer_limit:
+        index = keep - 1
+        line = lines[index].strip()
+        if line and not is_boilerplate[index]:
+            urls = _URL.findall(line)
+            if not urls or _URL.sub('', line).strip(' ()|-:*'):
+                break  # Real content
+            if links_left <= len(urls):
+                break  # The only link left
+            if not (all(_FOOTER_URL.search(url) for url in urls) or next_to_boilerplate(index)):
+                break
+            links_left -= len(urls)
+        elif line:
+            links_left -= len(_URL.findall(line))
+        keep -= 1
+    return '\n'.join(lines[:keep])
+
+def compact_email_body(text, max_tokens):
+    """Shrink an email body to the parts worth sending to Gemini.
+    
+    Removes tracking parameters from URLs, quoted reply chains, signatures and
+    legal/unsubscribe footer lines, collapses whitespace, and if the text is still
+    over max_tokens cuts it there, listing the links from the cut-off part
+    at the end so they still reach the summary.
+    """
+    if not text:
+        return ""
+    text = _URL.sub(lambda match: clean_tracking_url(match.group(0)), text)
+    
+    # Quoted history: keep only what the sender wrote (unless that leaves nothing)
+    reply = _find_reply_header(text)
+    if reply and text[:reply.start()].strip():
+        text = text[:reply.start()]
+    unquoted = _QUOTED_LINE.sub('', text)
+    if unquoted.strip():
+        text = unquoted
+    
+    signature = _SIGNATURE.search(text)
+    if signature and text[:signature.start()].strip():
+        text = text[:signature.start()]
+    
+    text = _trim_footer(text)
+    
+    text = re.sub(r'[ \t]+', ' ', text)
+    text = re.sub(r' ?\n ?', '\n', text)
+    text = re.sub(r'\n{3,}', '\n\n', text).strip()
+    
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    
+    # Over budget: keep the beginning, plus the links that would otherwise be lost
+    # (up to a third of the budget; the beginning never shrinks below two thirds)
+    min_head = max_chars * 2 // 3
+    links = []
+    for url in _URL.findall(text[min_head:]):
+        if url not in links and url not in text[:min_head]:
+            links.append(url)
+    
+    def link_block(urls):
+        block = ""
+        for url in urls:
+            line = ("\n\nLinks:\n" if not block else "\n") + url
+            if len(block) + len(line) > max_chars - min_head - 4:
+                break
+            block += line
+        return block
+    
+    head = text[:max_chars - len(link_block(links)) - 4]
+    cut = max(head.rfind('\n'), head.rfind(' '))
+    if cut > len(head) // 2:
+        head = head[:cut]
+    return head.rstrip() + " ..." + link_block([url for url in links if url not in head])
+
+# Per-call statuses in a Gmail batch worth retrying (429: too many concurrent requests)
+GMAIL_RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+def _is_retryable_gmail_error(exception):
+    status = getattr(getattr(exception, 'resp', None), 'status', None)
+    try:
+        status = int(status)
+    except (TypeError, ValueError):
+        return False
+    # Gmail also reports rate limits as 403 rateLimitExceeded / userRateLimitExceeded
+    return status in GMAIL_RETRYABLE_STATUS or (status == 403 and 'ratelimitexceeded' in str(exception).lower())
+
+def _execute_batches(service, ids, build_request, on_response, on_failure, batch_size, on_progress=None):
+    """Send one Gmail call per id in HTTP batches of batch_size.
+    
+    on_response(id, response) is called for each success. Calls that fail with a
+    rate-limit or server error are sent again in a follow-up batch after a backoff;
+    on_failure(id, exception) gets those still failing after
+    config.GMAIL_BATCH_MAX_RETRIES retries, and every other error right away.
+    """
+    ids = list(dict.fromkeys(ids))  # request ids must be unique within a batch
+    for start in range(0, len(ids), batch_size):
+        pending = ids[start:start + batch_size]
+        for attempt in range(config.GMAIL_BATCH_MAX_RETRIES + 1):
+            failed = {}
+            
+            def callback(request_id, response, exception):
+                if exception is None:
+                    on_response(request_id, response)
+                else:
+                    failed[request_id] = exception
+            
+            batch = service.new_batch_http_request(callback=callback)
+            for item_id in pending:
+                batch.add(build_request(item_id), request_id=item_id)
+            batch.execute()
+            
+            last_attempt = attempt == config.GMAIL_BATCH_MAX_RETRIES
+            pending = []
+            for item_id, exception in failed.items():
+                if not last_attempt and _is_retryable_gmail_error(exception):
+                    pending.append(item_id)
+                else:
+                    on_failure(item_id, exception)
+            if not pending:
+                break
+            time.sleep(min(config.GMAIL_MAX_BACKOFF, 2 ** attempt) * random.uniform(0.5, 1.0))
+        
+        if on_progress:
+            on_progress(min(start + batch_size, len(ids)), len(ids))
+
+def fetch_emails_batch(service, message_ids, batch_size=None, on_progress=None):
+    """Fetch subject, sender and body for many messages using Gmail HTTP batch requests.
+    
+    Each message is requested once with format='full' and the subject/sender are read
+    from the same payload, so N messages cost ceil(N / batch_size) round-trips instead
+    of 2N. Returns a dict mapping message id -> (subject, sender, body).
+    """
+    results = {}
+    
+    def on_failure(request_id, exception):
+        results[request_id] = ("Error", str(exception), f"Error reading email: {str(exception)}")
+    
+    def on_response(request_id, response):
+        try:
+            subject, sender = parse_email_headers(response)
+            results[request_id] = (subject, sender, extract_email_body(response))
+        except Exception as e:
+            on_failure(request_id, e)
+    
+    _execute_batches(
+        service, message_ids,
+        lambda msg_id: service.users().messages().get(userId='me', id=msg_id, format='full'),
+        on_response, on_failure, batch_size or config.GMAIL_BATCH_SIZE, on_progress
+    )
+    return results
+
+def build_thread_body(messages, max_tokens=None):
+    """Conversation text for the messages of a thread (oldest first), sent to Gemini as one email.
+    
+    Each message contributes only what it adds: compact_email_body already cuts
+    quoted reply chains, and lines repeated from earlier messages are dropped too.
+    If the thread is over max_tokens (config.THREAD_BODY_TOKEN_BUDGET) the newest
+    messages are kept and the oldest are reduced to their header line.
+    """
+    max_chars = (max_tokens or config.THREAD_BODY_TOKEN_BUDGET) * 4
+    seen_lines = set()
+    sections = []
+    for message in messages:
+        headers = {h.get('name', '').lower(): h.get('value', '') for h in message.get('payload', {}).get('headers', [])}
+        header = f"--- From: {headers.get('from', 'Unknown')} | Date: {headers.get('date', '')} ---"
+        lines = []
+        for line in extract_email_body(message).split('\n'):
+            key = ' '.join(line.split()).lower()
+            if len(key) > 20:
+                if key in seen_lines:
+                    continue
+                seen_lines.add(key)
+            lines.append(line)
+        sections.append((header, '\n'.join(lines).strip()))
+    
+    # Newest messages first until the budget is used up; older ones keep just the header
+    texts = []
+    used = 0
+    for header, text in reversed(sections):
+        if texts and used + len(header) + len(text) > max_chars:
+            text = "(earlier message, not shown)"
+        used += len(header) + len(text) + 2
+        texts.append(f"{header}\n{text}")
+    texts.reverse()
+    return f"Email conversation with {len(sections)} messages (oldest first):\n\n" + "\n\n".join(texts)
+
+def fetch_threads_batch(service, thread_ids, batch_size=None, on_progress=None):
+    """Fetch whole conversations using Gmail HTTP batch requests (threads.get, format='full').
+    
+    Returns a dict mapping thread id -> (subject, sender, body, latest_message_id),
+    where subject comes from the first message, sender is the latest message's
+    sender (with the message count for longer threads) and body is build_thread_body.
+    """
+    results = {}
+    
+    def on_failure(request_id, exception):
+        results[request_id] = ("Error", str(exception), f"Error reading email: {str(exception)}", None)
+    
+    def on_response(request_id, response):
+        try:
+            messages = response.get('messages', [])
+            subject, _ = parse_email_headers(messages[0])
+            _, sender = parse_email_headers(messages[-1])
+            if len(messages) > 1:
+                sender = f"{sender} ({len(messages)})"
+            results[request_id] = (subject, sender, build_thread_body(messages), messages[-1]['id'])
+        except Exception as e:
+            on_failure(request_id, e)
+    
+    _execute_batches(
+        service, thread_ids,
+        lambda thread_id: service.users().threads().get(userId='me', id=thread_id, format='full'),
+        on_response, on_failure, batch_size or config.GMAIL_BATCH_SIZE, on_progress
+    )
+    return results
+
+def is_primary_inbox(label_ids):
+    """True if a message with these labels shows up for the 'in:inbox category:primary' query"""
+    if 'INBOX' not in label_ids:
+        return False
+    return not any(label.startswith('CATEGORY_') and label != 'CATEGORY_PERSONAL' for label in label_ids)
+
+def fetch_inbox_changes(service, start_history_id):
+    """List Primary inbox changes since start_history_id using the Gmail history API.
+    
+    Returns (added_ids, removed_ids, history_id) where added_ids is oldest first and
+    history_id is the mailbox's current historyId. Raises HttpError 404 if
+    start_history_id is too old and a full reload is needed.
+    """
+    added_ids = []
+    removed_ids = set()
+    history_id = start_history_id
+    page_token = None
+    
+    while True:
+        response = service.users().history().list(
+            userId='me',
+            startHistoryId=start_history_id,
+            historyTypes=['messageAdded', 'messageDeleted', 'labelAdded', 'labelRemoved'],
+            pageToken=page_token
+        ).execute()
+        
+        for record in response.get('history', []):
+            for entry in record.get('messagesAdded', []) + record.get('labelsAdded', []):
+                message = entry.get('message', {})
+                if is_primary_inbox(message.get('labelIds', [])) and message['id'] not in added_ids:
+                    removed_ids.discard(message['id'])
+                    added_ids.append(message['id'])
+            for entry in record.get('messagesDeleted', []) + record.get('labelsRemoved', []):
+                message = entry.get('message', {})
+                if 'labelIds' in entry and is_primary_inbox(message.get('labelIds', [])):
+                    continue  # label change that keeps the message in Primary
+                if message.get('id') in added_ids:
+                    added_ids.remove(message['id'])
+                removed_ids.add(message.get('id'))
+        
+        history_id = response.get('historyId', history_id)
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            break
+    
+    return added_ids, removed_ids, history_id
+
+# ========== SUMMARY CACHE ==========
+# Bump whenever the Gemini prompt changes so previously cached summaries are regenerated
+PROMPT_VERSION = 1
+
+class SummaryCache:
+    """On-disk summary cache (SQLite) with least-recently-used eviction.
+    
+    Entries are keyed by a hash of the message id, the (already truncated) body,
+    the prompt version and the model endpoint, so any change to one of them
+    produces a fresh summary instead of a stale one.
+    """
+    
+    def __init__(self, path, max_entries):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS summaries ("
+            "key TEXT PRIMARY KEY, summary TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS summaries_last_used ON summaries (last_used)")
+        self._conn.commit()
+    
+    @staticmethod
+    def make_key(message_id, body, endpoint):
+        digest = hashlib.sha256()
+        for part in (message_id or "", body, str(PROMPT_VERSION), endpoint):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+    
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT summary FROM summaries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE summaries SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0]
+    
+    def put(self, key, summary):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (key, summary, last_used) VALUES (?, ?, ?)",
+                (key, summary, time.time())
+            )
+            # Evict least recently used entries beyond the size bound
+            self._conn.execute(
+                "DELETE FROM summaries WHERE key IN ("
+                "SELECT key FROM summaries ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+    
+    def clear(self):
+        """Delete every entry and compact the file, so no old summary text stays on disk"""
+        with self._lock:
+            self._conn.execute("DELETE FROM summaries")
+            self._conn.commit()
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._conn.execute("VACUUM")
+
+_summary_cache = None
+_summary_cache_enabled = True
+_summary_cache_lock = threading.Lock()
+
+def configure_summary_cache(path=None, enabled=True):
+    """Point the shared summary cache at another file, or turn caching off"""
+    global _summary_cache, _summary_cache_enabled
+    with _summary_cache_lock:
+        _summary_cache_enabled = enabled
+        _summary_cache = SummaryCache(path, config.SUMMARY_CACHE_MAX_ENTRIES) if enabled and path else None
+
+def get_summary_cache():
+    """Return the shared summary cache, or None if it is disabled or cannot be opened"""
+    global _summary_cache
+    with _summary_cache_lock:
+        if not _summary_cache_enabled:
+            return None
+        if _summary_cache is None:
+            try:
+                APP_DATA_DIR.mkdir(parents=True, exist_ok=True)
+                _summary_cache = SummaryCache(APP_DATA_DIR / config.SUMMARY_CACHE_FILE, config.SUMMARY_CACHE_MAX_ENTRIES)
+            except Exception:
+                return None
+        return _summary_cache
+
+def clear_summary_cache():
+    """Forget all cached summaries and draft replies (on logout)"""
+    cache = get_summary_cache()
+    if cache is not None:
+        cache.clear()
+
+class SingleFlight:
+    """Coalesces concurrent work on the same key.
+    
+    The first caller for a key (the leader) does the work; everyone arriving before
+    it finishes shares its result or exception instead of repeating it. Summaries
+    are keyed by their cache key, so duplicate clicks, bulk summarization and the
+    scheduler never pay for the same email twice at once.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> concurrent.futures.Future
+    
+    def join(self, key):
+        """Return (future, leader); a leader must call finish(key, ...) when done"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = self._calls[key] = concurrent.futures.Future()
+            return future, True
+    
+    def finish(self, key, result=None, error=None):
+        with self._lock:
+            future = self._calls.pop(key)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    
+    def do(self, key, fn):
+        """Run fn() once for all concurrent callers with this key"""
+        future, leader = self.join(key)
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+        except Exception as e:
+            self.finish(key, error=e)
+            raise
+        self.finish(key, result)
+        return result
+
+summary_flights = SingleFlight()
+
+# ========== EMAIL RECORDS ==========
+class EmailRecord:
+    """One loaded email (or conversation): what the list, summary panel and summarizer need.
+    
+    Slotted instead of a dict, so no per-email __dict__ is allocated, and senders are
+    interned because the same few senders repeat across thousands of emails.
+    """
+    
+    __slots__ = ('subject', 'sender', 'body', 'summary', 'cache_id')
+    
+    def __init__(self, subject, sender, body, summary=None, cache_id=None):
+        self.subject = subject
+        self.sender = sys.intern(sender)
+        self.body = body
+        self.summary = summary
+        self.cache_id = cache_id
+
+# ========== MAIL STORE ==========
+def _pack(text):
+    return None if text is None else zlib.compress(text.encode('utf-8'))
+
+def _unpack(blob):
+    return None if blob is None else zlib.decompress(blob).decode('utf-8')
+
+def fts_query(text):
+    """Turn search box text into an FTS5 query: every word must match, as a prefix"""
+    return ' '.join(f'"{term}"*' for term in re.findall(r'\w+', text))
+
+class MailStore:
+    """Local copy of fetched emails and their summaries, with a full-text index.
+    
+    Bodies and summaries are stored zlib-compressed; subjects, senders, bodies and
+    summaries are indexed in a contentless SQLite FTS5 table, so searching needs no
+    network and stays fast over tens of thousands of emails. Messages and
+    conversations are kept apart by kind ('message' or 'thread'). Without FTS5 in
+    the SQLite build, search falls back to LIKE over subjects and senders.
+    
+    The last inbox (order, historyId and load options) is saved too, so the app can
+    show it at startup and then only sync what changed.
+    """
+    
+    def __init__(self, path, max_emails):
+        self.max_emails = max_emails
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS emails ("
+            "num INTEGER PRIMARY KEY, kind TEXT NOT NULL, id TEXT NOT NULL, subject TEXT NOT NULL, "
+            "sender TEXT NOT NULL, body BLOB NOT NULL, summary BLOB, cache_id TEXT, UNIQUE (kind, id))"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        try:
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS emails_fts USING fts5("
+                "subject, sender, body, summary, content='', tokenize='unicode61 remove_diacritics 2')"
+            )
+            self.fts = True
+        except sqlite3.OperationalError:
+            self.fts = False
+        self._conn.commit()
+    
+    def _unindex(self, num, subject, sender, body, summary):
+        # Contentless FTS5 rows are removed by repeating the values they were indexed with
+        if self.fts:
+            self._conn.execute(
+                "INSERT INTO emails_fts (emails_fts, rowid, subject, sender, body, summary) "
+                "VALUES ('delete', ?, ?, ?, ?, ?)",
+                (num, subject, sender, _unpack(body), _unpack(summary) or "")
+            )
+    
+    def _index(self, num, subject, sender, body, summary):
+        if self.fts:
+            self._conn.execute(
+                "INSERT INTO emails_fts (rowid, subject, sender, body, summary) VALUES (?, ?, ?, ?, ?)",
+                (num, subject, sender, body, summary or "")
+            )
+    
+    def put(self, kind, records):
+        """Add or update emails from (id, subject, sender, body, cache_id) records.
+        
+        A stored summary is kept while the cache_id is unchanged (new replies to a
+        conversation change it).
+        """
+        with self._lock:
+            for email_id, subject, sender, body, cache_id in records:
+                row = self._conn.execute(
+                    "SELECT num, subject, sender, body, summary, cache_id FROM emails WHERE kind = ? AND id = ?",
+                    (kind, email_id)
+                ).fetchone()
+                if row is None:
+                    num = self._conn.execute(
+                        "INSERT INTO emails (kind, id, subject, sender, body, cache_id) VALUES (?, ?, ?, ?, ?, ?)",
+                        (kind, email_id, subject, sender, _pack(body), cache_id)
+                    ).lastrowid
+                    self._index(num, subject, sender, body, None)
+                    continue
+                num, old_summary = row[0], row[4]
+                summary = _unpack(old_summary) if row[5] == cache_id else None
+                self._unindex(*row[:5])
+                # Move the email to the end so eviction drops the longest-unseen ones first
+                new_num = self._conn.execute("SELECT COALESCE(MAX(num), 0) + 1 FROM emails").fetchone()[0]
+                self._conn.execute(
+                    "UPDATE emails SET num = ?, subject = ?, sender = ?, body = ?, summary = ?, cache_id = ? WHERE num = ?",
+                    (new_num, subject, sender, _pack(body), _pack(summary), cache_id, num)
+                )
+                self._index(new_num, subject, sender, body, summary)
+            self._evict()
+            self._conn.commit()
+    
+    def set_summary(self, kind, email_id, summary):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT num, subject, sender, body, summary FROM emails WHERE kind = ? AND id = ?",
+                (kind, email_id)
+            ).fetchone()
+            if row is None:
+                return
+            self._unindex(*row)
+            self._conn.execute("UPDATE emails SET summary = ? WHERE num = ?", (_pack(summary), row[0]))
+            self._index(row[0], row[1], row[2], _unpack(row[3]), summary)
+            self._conn.commit()
+    
+    @staticmethod
+    def _record(row):
+        return EmailRecord(row[0], row[1], _unpack(row[2]), _unpack(row[3]), row[4])
+    
+    def get(self, kind, email_id):
+        """Stored email as an EmailRecord, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT subject, sender, body, summary, cache_id FROM emails WHERE kind = ? AND id = ?",
+                (kind, email_id)
+            ).fetchone()
+        return None if row is None else self._record(row)
+    
+    def get_many(self, kind, email_ids):
+        """Dict id -> EmailRecord for the ids that are in the store"""
+        records = {}
+        email_ids = list(email_ids)
+        with self._lock:
+            for start in range(0, len(email_ids), 500):  # stay below SQLite's bound-parameter limit
+                chunk = email_ids[start:start + 500]
+                rows = self._conn.execute(
+                    "SELECT id, subject, sender, body, summary, cache_id FROM emails "
+                    f"WHERE kind = ? AND id IN ({','.join('?' * len(chunk))})",
+                    [kind] + chunk
+                ).fetchall()
+                for row in rows:
+                    records[row[0]] = self._record(row[1:])
+        return records
+    
+    def save_inbox(self, kind, email_ids, history_id, max_emails):
+        """Remember the displayed inbox for the next startup"""
+        snapshot = {'kind': kind, 'ids': list(email_ids), 'history_id': history_id, 'max_emails': max_emails}
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO state (key, value) VALUES ('inbox', ?)", (json.dumps(snapshot),)
+            )
+            self._conn.commit()
+    
+    def load_inbox(self):
+        """The last saved inbox as a dict (kind, ids, history_id, max_emails), or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM state WHERE key = 'inbox'").fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+    
+    def search(self, kind, text, limit=None):
+        """(id, subject, sender) of the stored emails matching text, most recently fetched first"""
+        limit = limit or config.SEARCH_MAX_RESULTS
+        with self._lock:
+            if self.fts:
+                query = fts_query(text)
+                if not query:
+                    return []
+                return self._conn.execute(
+                    "SELECT e.id, e.subject, e.sender FROM emails_fts JOIN emails e ON e.num = emails_fts.rowid "
+                    "WHERE emails_fts MATCH ? AND e.kind = ? ORDER BY emails_fts.rowid DESC LIMIT ?",
+                    (query, kind, limit)
+                ).fetchall()
+            terms = re.findall(r'\w+', text)
+            if not terms:
+                return []
+            where = " AND ".join(["(subject LIKE ? ESCAPE '\\' OR sender LIKE ? ESCAPE '\\')"] * len(terms))
+            params = []
+            for term in terms:
+                pattern = '%' + term.replace('_', '\\_') + '%'  # \w+ terms contain no % or backslash
+                params += [pattern, pattern]
+            return self._conn.execute(
+                f"SELECT id, subject, sender FROM emails WHERE kind = ? AND {where} ORDER BY num DESC LIMIT ?",
+                [kind] + params + [limit]
+            ).fetchall()
+    
+    def _evict(self):
+        """Drop the oldest emails beyond max_emails (lock held)"""
+        excess = self._conn.execute("SELECT COUNT(*) FROM emails").fetchone()[0] - self.max_emails
+        if excess <= 0:
+            return
+        rows = self._conn.execute(
+            "SELECT num, subject, sender, body, summary FROM emails ORDER BY num LIMIT ?", (excess,)
+        ).fetchall()
+        for row in rows:
+            self._unindex(*row)
+        self._conn.executemany("DELETE FROM emails WHERE num = ?", [(row[0],) for row in rows])
+
+_mail_store = None
+_mail_store_lock = threading.Lock()
+
+def get_mail_store():
+    """Return the shared mail store, or None if it cannot be opened"""
+    global _mail_store
+    with _mail_store_lock:
+        if _mail_store is None:
+            try:
+                APP_DATA_DIR.mkdir(parents=True, exist_ok=True)
+                _mail_store = MailStore(APP_DATA_DIR / config.MAIL_STORE_FILE, config.MAIL_STORE_MAX_EMAILS)
+            except Exception:
+                return None
+        return _mail_store
+
+def delete_mail_store():
+    """Close the mail store and delete its files (on logout, so no mail stays on disk)"""
+    global _mail_store
+    with _mail_store_lock:
+        if _mail_store is not None:
+            _mail_store.close()
+            _mail_store = None
+        path = APP_DATA_DIR / config.MAIL_STORE_FILE
+        for suffix in ("", "-wal", "-shm"):
+            target = Path(str(path) + suffix)
+            if target.exists():
+                target.unlink()
+
+# ========== GEMINI CLIENT ==========
+# HTTP statuses worth retrying; 429/503 also signal that we are sending too fast
+GEMINI_RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+GEMINI_THROTTLE_STATUS = {429, 503}
+
+class GeminiTransientError(Exception):
+    """Gemini request still failing with a rate-limit/server error after all retries"""
+
+class TokenBucket:
+    """Thread-safe token bucket limiting the request rate across all callers.
+    
+    Urgent callers (the email the user is looking at) may borrow one token ahead;
+    the debt delays the following requests, so the average rate is unchanged.
+    """
+    
+    def __init__(self, rate, capacity):
+        self.rate = rate  # tokens added per second
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _reserve(self, urgent=False):
+        """Take a token if one is available, otherwise return the seconds until there is one"""
+        needed = 0 if urgent else 1
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= needed:
+                self._tokens -= 1
+                return 0
+            return (needed - self._tokens) / self.rate
+    
+    def acquire(self, urgent=False):
+        """Block until a token is available and take it"""
+        wait = self._reserve(urgent)
+        while wait:
+            time.sleep(wait)
+            wait = self._reserve(urgent)
+    
+    async def acquire_async(self):
+        """Like acquire(), but waits on the event loop instead of blocking the thread"""
+        wait = self._reserve()
+        while wait:
+            await asyncio.sleep(wait)
+            wait = self._reserve()
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD concurrency limit for in-flight requests.
+    
+    Every successful request grows the limit additively (about one slot per full
+    window of successes); every throttled response halves it. Urgent requests may
+    use one slot beyond the limit and are let in before waiting bulk requests.
+    """
+    
+    def __init__(self, maximum):
+        self.maximum = max(1, int(maximum))
+        self.limit = float(self.maximum)
+        self._in_flight = 0
+        self._urgent_waiting = 0
+        self._cond = threading.Condition()
+    
+    def acquire(self, urgent=False):
+        with self._cond:
+            if urgent:
+                self._urgent_waiting += 1
+                while self._in_flight > int(self.limit):
+                    self._cond.wait()
+                self._urgent_waiting -= 1
+            else:
+                while self._in_flight >= int(self.limit) or self._urgent_waiting:
+                    self._cond.wait()
+            self._in_flight += 1
+    
+    def release(self, throttled=False):
+        with self._cond:
+            self._in_flight -= 1
+            self._adjust(throttled)
+            self._cond.notify_all()
+    
+    def _adjust(self, throttled):
+        if throttled:
+            self.limit = max(1.0, self.limit / 2)
+        else:
+            self.limit = min(float(self.maximum), self.limit + 1.0 / self.limit)
+
+class AsyncConcurrencyLimiter(AdaptiveConcurrencyLimiter):
+    """AdaptiveConcurrencyLimiter for coroutines (create and use it on one event loop)"""
+    
+    def __init__(self, maximum):
+        super().__init__(maximum)
+        self._cond = asyncio.Condition()
+    
+    async def acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._in_flight < int(self.limit))
+            self._in_flight += 1
+    
+    async def release(self, throttled=False):
+        async with self._cond:
+            self._in_flight -= 1
+            self._adjust(throttled)
+            self._cond.notify_all()
+
+def _parse_retry_delay(headers, error_json):
+    """Get the server-requested retry delay in seconds (Retry-After header or RetryInfo), if any"""
+    retry_after = headers.get('Retry-After')
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    try:
+        for detail in error_json.get('error', {}).get('details', []):
+            if detail.get('@type', '').endswith('google.rpc.RetryInfo'):
+                return float(detail.get('retryDelay', '').rstrip('s'))
+    except Exception:
+        pass
+    return None
+
+class GeminiClient:
+    """Shared Gemini HTTP client backed by a keep-alive connection pool.
+    
+    One requests.Session is reused for every call so TLS connections to the Gemini
+    endpoint are pooled instead of opened per email. The pool is sized by the
+    concurrency setting, which also sizes the bulk summarization executor.
+    
+    All callers share one token-bucket rate limiter and one adaptive concurrency
+    limit; 429/5xx responses are retried with jittered exponential backoff that
+    honors Retry-After.
+    """
+    
+    def __init__(self, concurrency, connect_timeout, read_timeout,
+                 requests_per_minute, max_retries, max_backoff):
+        self.concurrency = max(1, int(concurrency))
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+        self.rate_limiter = TokenBucket(requests_per_minute / 60.0, self.concurrency)
+        self.concurrency_limiter = AdaptiveConcurrencyLimiter(self.concurrency)
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+    
+    def _backoff_delay(self, attempt, retry_delay):
+        """Full-jitter exponential backoff, never shorter than the server-requested delay"""
+        delay = random.uniform(0, min(self.max_backoff, 2 ** attempt))
+        if retry_delay is not None:
+            delay = max(delay, retry_delay)
+        return delay
+    
+    def _post(self, url, payload, stream=False, urgent=False):
+        """POST with rate limiting and retries, returning the first non-retryable response.
+        
+        urgent requests (the selected email) get priority on the rate and concurrency
+        limits. The request keeps its concurrency slot; the caller must release it with
+        self.concurrency_limiter.release() once it is done reading the response.
+        Raises GeminiTransientError if the request is still throttled or failing
+        with a server error after max_retries retries.
+        """
+        last_error = "no response"
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire(urgent)
+            self.concurrency_limiter.acquire(urgent)
+            throttled = False
+            retry_delay = None
+            keep_slot = False
+            try:
+                response = self.session.post(url, json=payload, timeout=self.timeout, stream=stream)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                last_error = str(e)
+            else:
+                if response.status_code not in GEMINI_RETRYABLE_STATUS:
+                    keep_slot = True
+                    return response
+                throttled = response.status_code in GEMINI_THROTTLE_STATUS
+                try:
+                    error_json = response.json()
+                except ValueError:
+                    error_json = None
+                retry_delay = _parse_retry_delay(response.headers, error_json)
+                last_error = f"HTTP {response.status_code}"
+                response.close()
+            finally:
+                if not keep_slot:
+                    self.concurrency_limiter.release(throttled)
+            
+            if attempt == self.max_retries:
+                break
+            # Give up early rather than stall a worker if the server asks for a very long wait
+            if retry_delay is not None and retry_delay > self.max_backoff:
+                break
+            time.sleep(self._backoff_delay(attempt, retry_delay))
+        
+        raise GeminiTransientError(f"Gemini API unavailable ({last_error}), please try again later")
+    
+    def generate_content(self, endpoint, api_key, payload, urgent=False):
+        """POST a generateContent request and return the decoded JSON response"""
+        response = self._post(f"{endpoint}?key={api_key}", payload, urgent=urgent)
+        try:
+            return response.json()
+        finally:
+            self.concurrency_limiter.release()
+    
+    def stream_generate_content(self, endpoint, api_key, payload, urgent=False):
+        """POST a streamGenerateContent request and yield each decoded server-sent event.
+        
+        Error responses are not event streams; their JSON body is yielded once instead.
+        """
+        response = self._post(f"{endpoint}?alt=sse&key={api_key}", payload, stream=True, urgent=urgent)
+        try:
+            if response.status_code != 200:
+                yield response.json()
+                return
+            response.encoding = 'utf-8'  # SSE responses carry no charset
+            for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                if line and line.startswith('data:'):
+                    yield json.loads(line[5:].strip())
+        finally:
+            response.close()
+            self.concurrency_limiter.release()
+
+_gemini_client = None
+_gemini_client_lock = threading.Lock()
+
+def _new_gemini_client(concurrency=None, requests_per_minute=None):
+    return GeminiClient(
+        concurrency or config.GEMINI_CONCURRENCY,
+        config.GEMINI_CONNECT_TIMEOUT,
+        config.GEMINI_READ_TIMEOUT,
+        requests_per_minute or config.GEMINI_REQUESTS_PER_MINUTE,
+        config.GEMINI_MAX_RETRIES,
+        config.GEMINI_MAX_BACKOFF
+    )
+
+def configure_gemini_client(concurrency=None, requests_per_minute=None):
+    """Replace the shared Gemini client, overriding the config.py concurrency or rate limit"""
+    global _gemini_client
+    with _gemini_client_lock:
+        _gemini_client = _new_gemini_client(concurrency, requests_per_minute)
+        return _gemini_client
+
+def get_gemini_client():
+    """Return the shared Gemini client, creating it on first use"""
+    global _gemini_client
+    with _gemini_client_lock:
+        if _gemini_client is None:
+            _gemini_client = _new_gemini_client()
+        return _gemini_client
+
+def get_gemini_api_key():
+    """Get API key from AppData/.env (priority) or config module (fallback)"""
+    return get_settings().gemini_api_key
+
+def gmail_link_markdown(message_id):
+    """Markdown line linking to the message in Gmail (empty without a message id)"""
+    if not message_id:
+        return ""
+    return f"**📧 Open in Gmail:** https://mail.google.com/mail/u/0/#inbox/{message_id}\n\n"
+
+def _cached_summary(cache, cache_key):
+    """Look a summary up in the cache (None if missing or the cache is unavailable)"""
+    if cache:
+        try:
+            return cache.get(cache_key)
+        except Exception:
+            pass
+    return None
+
+def _store_summary(cache, cache_key, summary):
+    if cache:
+        try:
+            cache.put(cache_key, summary)
+        except Exception:
+            pass
+
+def build_summary_payload(body):
+    """generateContent request body for summarizing one email and drafting a reply"""
+    prompt = f"""You are an AI email assistant. Analyze the following email and provide a response.
+
+Your response MUST include the following sections:
+
+1. **SUMMARY** section:
+   - List only the most important points (3-5 bullet points max)
+   - Use * for bullet points
+   - Be brief and focused on key information only
+
+2. **RELEVANT LINKS** section (if there are any URLs/links in the email):
+   - Include a sub-heading: **Relevant Links**
+   - For each link, provide a descriptive title followed by the URL
+   - Format each link as: * [Link Description]: https://example.com
+   - The URL must start with http:// or https://
+   - Include a brief title that explains what the link is relevant to
+   - If no links found, skip this section entirely
+
+3. **DRAFT REPLY** section:
+   - Write a complete, ready-to-send professional email reply
+   - Include proper greeting and closing
+   - Address all important points from the original email
+   - Make it natural and conversational but professional
+   - This should be a full email, not a summary
+
+Formatting rules:
+- Use **SUMMARY**, **RELEVANT LINKS**, and **DRAFT REPLY** as section headers (bold inline, like **HEADER**)
+- For summary and links, use * for bullet lists
+- For links, format as: * [Title]: https://url
+- For draft reply, write as a complete email without bullet points
+- IMPORTANT: Format links as plain URLs starting with http:// or https:// so they are recognized as clickable
+- Make sure all sections are complete
+
+Email to analyze:
+{body}
+"""
+    return {
+        "contents": [
+            {
+                "parts": [
+                    {"text": prompt}
+                ]
+            }
+        ],
+        "generationConfig": {
+            "temperature": 0.3,
+            "maxOutputTokens": 4096
+        }
+    }
+
+def summary_response_text(resp_json):
+    """Extract the generated text from a generateContent response.
+    
+    Returns (text, None) on success or (None, message) describing what went wrong.
+    """
+    if 'candidates' in resp_json and resp_json['candidates']:
+        try:
+            candidate = resp_json['candidates'][0]
+            if 'content' in candidate and 'parts' in candidate['content']:
+                return candidate['content']['parts'][0]['text'], None
+            elif 'content' in candidate and 'text' in candidate['content']:
+                return candidate['content']['text'], None
+            else:
+                return None, f"Unexpected response structure"
+        except (KeyError, IndexError, TypeError) as e:
+            return None, f"Error extracting text: {str(e)}"
+    elif 'error' in resp_json:
+        return None, f"Error from Gemini API: {resp_json['error'].get('message', 'Unknown Error')}"
+    else:
+        return None, "Gemini API response was empty or malformed"
+
+def gemini_summarize_and_reply(body, message_id=None, on_partial=None, cache_id=None, urgent=False):
+    """Summarize an email and draft a reply with Gemini.
+    
+    If on_partial is given (and streaming is enabled) the response is streamed and
+    on_partial(text) is called with each new fragment as it arrives; the complete
+    summary is still returned at the end. cache_id replaces message_id in the
+    cache key (conversations use "<thread id>:<latest message id>").
+    A call that joins a request already in flight for the same summary gets no
+    partial fragments, only the result. urgent requests skip ahead of bulk work
+    at the Gemini client's rate and concurrency limits.
+    """
+    if not body.strip():
+        return "No email content to summarize."
+    # Callers asking for the same summary concurrently share one request
+    cache_key = SummaryCache.make_key(cache_id or message_id, body, GEMINI_ENDPOINT)
+    return summary_flights.do(cache_key, lambda: _summarize_one(body, message_id, cache_key, on_partial, urgent))
+
+def _summarize_one(body, message_id, cache_key, on_partial=None, urgent=False):
+    """Cached summary or a new Gemini request for one email (runs as the leader of its flight)"""
+    try:
+        # Serve previously generated summaries from the on-disk cache
+        cache = get_summary_cache()
+        cached = _cached_summary(cache, cache_key)
+        if cached is not None:
+            return cached
+        
+        # Add Gmail link at the top if message_id is provided
+        gmail_link = gmail_link_markdown(message_id)
+        
+        api_key = get_gemini_api_key()
+        payload = build_summary_payload(body)
+        
+        if on_partial is not None and config.GEMINI_STREAMING:
+            # Stream the response so the first lines can be shown while the rest is generated
+            on_partial(gmail_link)
+            fragments = []
+            for chunk in get_gemini_client().stream_generate_content(config.GEMINI_STREAM_ENDPOINT, api_key, payload, urgent):
+                if 'error' in chunk:
+                    return f"Error from Gemini API: {chunk['error'].get('message', 'Unknown Error')}"
+                for candidate in chunk.get('candidates', [])[:1]:
+                    for part in candidate.get('content', {}).get('parts', []):
+                        text = part.get('text', '')
+                        if text:
+                            fragments.append(text)
+                            on_partial(text)
+            if not fragments:
+                return "Gemini API response was empty or malformed"
+            ai_response = ''.join(fragments)
+        else:
+            # Reuse pooled keep-alive connections (with connect/read timeouts)
+            resp_json = get_gemini_client().generate_content(GEMINI_ENDPOINT, api_key, payload, urgent)
+            ai_response, error = summary_response_text(resp_json)
+            if error:
+                return error
+        
+        # Prepend Gmail link to the response
+        summary = gmail_link + ai_response
+        _store_summary(cache, cache_key, summary)
+        return summary
+    except GeminiTransientError:
+        # Let callers leave the summary unset so it is retried later instead of cached
+        raise
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+# ========== BATCH SUMMARIZATION ==========
+# Structured output for a multi-email request: one object per email, keyed by the id we assign
+BATCH_RESPONSE_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "id": {"type": "STRING"},
+            "summary": {"type": "ARRAY", "items": {"type": "STRING"}},
+            "links": {
+                "type": "ARRAY",
+                "items": {
+                    "type": "OBJECT",
+                    "properties": {"title": {"type": "STRING"}, "url": {"type": "STRING"}},
+                    "required": ["title", "url"]
+                }
+            },
+            "draft_reply": {"type": "STRING"}
+        },
+        "required": ["id", "summary", "links", "draft_reply"]
+    }
+}
+
+def estimate_tokens(text):
+    """Rough Gemini token count (about 4 characters per token)"""
+    return len(text) // 4 + 1
+
+def plan_summary_batches(items):
+    """Group (message_id, body) pairs into batches for gemini_summarize_batch.
+    
+    Short emails are packed together until the batch token budget or the email
+    limit is reached; emails above GEMINI_BATCH_MAX_EMAIL_TOKENS get a batch of
+    their own and are summarized with the regular single-email prompt.
+    """
+    batches = []
+    current = []
+    current_tokens = 0
+    for message_id, body in items:
+        tokens = estimate_tokens(body)
+        if tokens > config.GEMINI_BATCH_MAX_EMAIL_TOKENS:
+            batches.append([(message_id, body)])
+            continue
+        if current and (current_tokens + tokens > config.GEMINI_BATCH_TOKEN_BUDGET
+                        or len(current) >= config.GEMINI_BATCH_MAX_EMAILS):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append((message_id, body))
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def run_summary_pipeline(chunks, summarize_batch, workers, queue_size=None, plan=plan_summary_batches):
+    """Summarize emails while they are still being fetched (producer/consumer).
+    
+    chunks is an iterable yielding lists of (message_id, body) as they become
+    available (typically a generator that fetches the next few messages). Each
+    chunk is planned into summary batches (by plan) that are handed to `workers` threads
+    running summarize_batch(batch). The queue between them is bounded, so
+    fetching pauses when Gemini falls behind. Returns once every batch is done;
+    the first exception raised by the producer or a worker is re-raised.
+    """
+    work = queue.Queue(maxsize=queue_size or workers * 2)
+    errors = []
+    
+    def consume():
+        while True:
+            batch = work.get()
+            if batch is None:
+                return
+            try:
+                summarize_batch(batch)
+            except Exception as e:
+                errors.append(e)
+    
+    threads = [threading.Thread(target=consume, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    try:
+        for items in chunks:
+            for batch in plan(items):
+                work.put(batch)
+    finally:
+        for _ in threads:
+            work.put(None)
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+
+def format_batch_summary(entry):
+    """Render one structured batch entry in the same markdown layout as a single summary"""
+    lines = ["**SUMMARY**", ""]
+    lines += [f"* {point}" for point in entry.get('summary', []) if point]
+    links = [link for link in entry.get('links', []) if str(link.get('url', '')).startswith(('http://', 'https://'))]
+    if links:
+        lines += ["", "**RELEVANT LINKS**", ""]
+        lines += [f"* {link.get('title', 'Link')}: {link['url']}" for link in links]
+    lines += ["", "**DRAFT REPLY**", "", entry.get('draft_reply', '').strip()]
+    return "\n".join(lines)
+
+def _split_cached_batch(items, cache_ids, cache):
+    """Split batch items into ready results (cached or empty) and the (id, body) pairs still to summarize"""
+    results = {}
+    pending = []
+    for message_id, body in items:
+        if not body.strip():
+            results[message_id] = gemini_summarize_and_reply(body, message_id)
+            continue
+        cached = _cached_summary(cache, SummaryCache.make_key(cache_ids.get(message_id) or message_id, body, GEMINI_ENDPOINT))
+        if cached is not None:
+            results[message_id] = cached
+        else:
+            pending.append((message_id, body))
+    return results, pending
+
+def build_batch_payload(pending):
+    """generateContent request body summarizing several (message_id, body) pairs at once"""
+    emails_text = "\n\n".join(
+        f"=== EMAIL id={index} ===\n{body}" for index, (_, body) in enumerate(pending, start=1)
+    )
+    prompt = f"""You are an AI email assistant. Analyze each of the following emails independently.
+
+Return one JSON object per email with:
+- "id": the email's id exactly as given in its header
+- "summary": only the most important points (3-5 items max), brief and focused; use **bold** for key facts
+- "links": the relevant URLs from the email, each with a short descriptive "title" and the full "url" starting with http:// or https:// (empty list if there are none)
+- "draft_reply": a complete, ready-to-send professional reply with proper greeting and closing that addresses all important points (a full email, not a summary)
+
+Emails to analyze:
+
+{emails_text}
+"""
+    return {
+        "contents": [{"parts": [{"text": prompt}]}],
+        "generationConfig": {
+            "temperature": 0.3,
+            "maxOutputTokens": 4096 * len(pending),
+            "responseMimeType": "application/json",
+            "responseSchema": BATCH_RESPONSE_SCHEMA
+        }
+    }
+
+def batch_response_summaries(resp_json, pending, cache_ids, cache):
+    """Summaries (cached as they are rendered) for the pending emails a batch response covers completely.
+    
+    An unparseable response yields no summaries, so every email falls back to a single request.
+    """
+    try:
+        text = resp_json['candidates'][0]['content']['parts'][0]['text']
+        entries = {str(entry.get('id')): entry for entry in json.loads(text) if isinstance(entry, dict)}
+    except Exception:
+        return {}
+    
+    results = {}
+    for index, (message_id, body) in enumerate(pending, start=1):
+        entry = entries.get(str(index))
+        if not entry or not entry.get('summary') or not entry.get('draft_reply'):
+            continue
+        summary = gmail_link_markdown(message_id) + format_batch_summary(entry)
+        results[message_id] = summary
+        _store_summary(cache, SummaryCache.make_key(cache_ids.get(message_id) or message_id, body, GEMINI_ENDPOINT), summary)
+    return results
+
+def _claim_batch(pending, cache_ids):
+    """Join the summary flight of every pending email.
+    
+    Returns (mine, waiting): the (message_id, body, cache_key) this caller leads and
+    must finish, and the (message_id, future) already being summarized elsewhere.
+    """
+    mine = []
+    waiting = []
+    for message_id, body in pending:
+        cache_key = SummaryCache.make_key(cache_ids.get(message_id) or message_id, body, GEMINI_ENDPOINT)
+        future, leader = summary_flights.join(cache_key)
+        if leader:
+            mine.append((message_id, body, cache_key))
+        else:
+            waiting.append((message_id, future))
+    return mine, waiting
+
+def _finish_batch_flights(mine, results, error=None):
+    """Hand this batch's summaries (or the error that stopped it) to waiting callers"""
+    for message_id, _, cache_key in mine:
+        if message_id in results:
+            summary_flights.finish(cache_key, results[message_id])
+        else:
+            summary_flights.finish(cache_key, error=error or RuntimeError("Summary was not generated"))
+
+def gemini_summarize_batch(items, cache_ids=None):
+    """Summarize several short emails with a single Gemini request.
+    
+    items is a list of (message_id, body). Returns a dict message_id -> summary.
+    Cached summaries are reused; emails the batch response does not cover (or all
+    of them, if it cannot be parsed) fall back to gemini_summarize_and_reply.
+    cache_ids optionally maps message ids to their cache_id (see gemini_summarize_and_reply).
+    Emails another caller is already summarizing share that request's result.
+    """
+    cache_ids = cache_ids or {}
+    cache = get_summary_cache()
+    results, pending = _split_cached_batch(items, cache_ids, cache)
+    # Emails another caller is already summarizing are waited for, not requested again
+    mine, waiting = _claim_batch(pending, cache_ids)
+    
+    try:
+        if len(mine) > 1:
+            claimed = [(message_id, body) for message_id, body, _ in mine]
+            try:
+                resp_json = get_gemini_client().generate_content(GEMINI_ENDPOINT, get_gemini_api_key(), build_batch_payload(claimed))
+            except GeminiTransientError:
+                raise
+            except Exception:
+                resp_json = None
+            results.update(batch_response_summaries(resp_json, claimed, cache_ids, cache))
+        
+        for message_id, body, cache_key in mine:
+            if message_id not in results:
+                results[message_id] = _summarize_one(body, message_id, cache_key)
+    except Exception as e:
+        _finish_batch_flights(mine, results, e)
+        raise
+    _finish_batch_flights(mine, results)
+    
+    for message_id, future in waiting:
+        results[message_id] = future.result()
+    return results
+
+# ========== ASYNC ENGINE ==========
+def async_engine_available():
+    """True if aiohttp is installed; without it bulk summaries run on the thread pool"""
+    return importlib.util.find_spec('aiohttp') is not None
+
+class AsyncGeminiClient:
+    """aiohttp counterpart of GeminiClient for the async engine.
+    
+    It shares the sync client's rate limiter, timeouts and retry settings, so both
+    stay within one request budget, but has its own larger concurrency limit: a
+    request in flight here is a small coroutine instead of a blocked worker thread.
+    Create and use it on the engine loop only.
+    """
+    
+    def __init__(self, client, concurrency):
+        self.client = client
+        self.concurrency = max(1, int(concurrency))
+        self.concurrency_limiter = AsyncConcurrencyLimiter(self.concurrency)
+        connect_timeout, read_timeout = client.timeout
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.concurrency),
+            timeout=aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout),
+            headers={"Content-Type": "application/json"}
+        )
+    
+    async def generate_content(self, endpoint, api_key, payload):
+        """POST a generateContent request and return the decoded JSON response.
+        
+        Retries like GeminiClient._post and raises GeminiTransientError when the
+        request is still throttled or failing after max_retries retries.
+        """
+        client = self.client
+        last_error = "no response"
+        for attempt in range(client.max_retries + 1):
+            await client.rate_limiter.acquire_async()
+            await self.concurrency_limiter.acquire()
+            throttled = False
+            retry_delay = None
+            try:
+                async with self.session.post(f"{endpoint}?key={api_key}", json=payload) as response:
+                    try:
+                        resp_json = await response.json(content_type=None)
+                    except ValueError:
+                        resp_json = None
+                    if response.status not in GEMINI_RETRYABLE_STATUS:
+                        if resp_json is None:
+                            raise ValueError(f"Invalid JSON response (HTTP {response.status})")
+                        return resp_json
+                    throttled = response.status in GEMINI_THROTTLE_STATUS
+                    retry_delay = _parse_retry_delay(response.headers, resp_json)
+                    last_error = f"HTTP {response.status}"
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = str(e) or type(e).__name__
+            finally:
+                await self.concurrency_limiter.release(throttled)
+            
+            if attempt == client.max_retries:
+                break
+            if retry_delay is not None and retry_delay > client.max_backoff:
+                break
+            await asyncio.sleep(client._backoff_delay(attempt, retry_delay))
+        
+        raise GeminiTransientError(f"Gemini API unavailable ({last_error}), please try again later")
+    
+    async def close(self):
+        await self.session.close()
+
+class AsyncEngine:
+    """asyncio event loop running on a dedicated daemon thread.
+    
+    Worker threads hand it coroutines with submit() and get concurrent futures back;
+    the Tk main loop is left alone and still receives results through UIDispatcher.
+    The loop is started on first use and shut down at interpreter exit.
+    """
+    
+    def __init__(self):
+        self._loop = None
+        self._lock = threading.Lock()
+        self._gemini = None
+    
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="async-engine", daemon=True).start()
+                atexit.register(self.shutdown)
+                self._loop = loop
+            return self._loop
+    
+    def shutdown(self):
+        """Close the Gemini session and stop the loop"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        
+        async def close_gemini():
+            if self._gemini is not None:
+                await self._gemini.close()
+                self._gemini = None
+        
+        try:
+            asyncio.run_coroutine_threadsafe(close_gemini(), loop).result(timeout=5)
+        except Exception:
+            pass
+        loop.call_soon_threadsafe(loop.stop)
+    
+    def submit(self, coro):
+        """Schedule a coroutine on the engine loop and return a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+    
+    def gemini(self):
+        """The engine's AsyncGeminiClient, following configure_gemini_client() (engine loop only)"""
+        client = get_gemini_client()
+        if self._gemini is None or self._gemini.client is not client:
+            if self._gemini is not None:
+                asyncio.ensure_future(self._gemini.close())
+            self._gemini = AsyncGeminiClient(client, config.GEMINI_ASYNC_CONCURRENCY)
+        return self._gemini
+
+async_engine = AsyncEngine()
+
+async def _summarize_one_async(body, message_id, cache_key):
+    """Coroutine version of _summarize_one (without streaming); the caller leads the flight"""
+    try:
+        cache = get_summary_cache()
+        cached = _cached_summary(cache, cache_key)
+        if cached is not None:
+            return cached
+        
+        resp_json = await async_engine.gemini().generate_content(
+            GEMINI_ENDPOINT, get_gemini_api_key(), build_summary_payload(body)
+        )
+        ai_response, error = summary_response_text(resp_json)
+        if error:
+            return error
+        
+        summary = gmail_link_markdown(message_id) + ai_response
+        _store_summary(cache, cache_key, summary)
+        return summary
+    except GeminiTransientError:
+        raise
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+async def gemini_summarize_batch_async(items, cache_ids=None):
+    """Coroutine version of gemini_summarize_batch; fallback single requests run concurrently"""
+    cache_ids = cache_ids or {}
+    cache = get_summary_cache()
+    results, pending = _split_cached_batch(items, cache_ids, cache)
+    mine, waiting = _claim_batch(pending, cache_ids)
+    
+    try:
+        if len(mine) > 1:
+            claimed = [(message_id, body) for message_id, body, _ in mine]
+            try:
+                resp_json = await async_engine.gemini().generate_content(
+                    GEMINI_ENDPOINT, get_gemini_api_key(), build_batch_payload(claimed)
+                )
+            except GeminiTransientError:
+                raise
+            except Exception:
+                resp_json = None
+            results.update(batch_response_summaries(resp_json, claimed, cache_ids, cache))
+        
+        missing = [(message_id, body, cache_key) for message_id, body, cache_key in mine if message_id not in results]
+        summaries = await asyncio.gather(*[
+            _summarize_one_async(body, message_id, cache_key) for message_id, body, cache_key in missing
+        ])
+        results.update(zip([message_id for message_id, _, _ in missing], summaries))
+    except BaseException as e:
+        # Cancellation too must resolve the claimed flights, or their waiters would hang
+        error = e if isinstance(e, Exception) else GeminiTransientError("Summary request was cancelled, please try again")
+        _finish_batch_flights(mine, results, error)
+        raise
+    _finish_batch_flights(mine, results)
+    
+    for message_id, future in waiting:
+        results[message_id] = await asyncio.wrap_future(future)
+    return results
+
+def run_summary_pipeline_async(chunks, summarize_batch, max_in_flight=None, plan=plan_summary_batches):
+    """Async engine version of run_summary_pipeline.
+    
+    summarize_batch is a coroutine function run on the engine loop. At most
+    max_in_flight batches are outstanding; beyond that, fetching the next chunk waits.
+    """
+    slots = threading.BoundedSemaphore(max_in_flight or config.GEMINI_ASYNC_CONCURRENCY * 2)
+    futures = []
+    try:
+        for items in chunks:
+            for batch in plan(items):
+                slots.acquire()
+                future = async_engine.submit(summarize_batch(batch))
+                future.add_done_callback(lambda _: slots.release())
+                futures.append(future)
+    finally:
+        concurrent.futures.wait(futures)
+    for future in futures:
+        future.result()
+
+def summarize_pipeline(chunks, on_batch_done, cache_ids=None, batched=True):
+    """Summarize emails while they are still being fetched.
+    
+    chunks yields lists of (message_id, body) as they become available. For every
+    batch, on_batch_done(batch, summaries, error) is called from a worker with either
+    the dict of summaries or the exception that failed the whole batch.
+    cache_ids(batch) optionally returns the batch's cache_id mapping, and batched=False
+    sends every email in its own request. Runs on the async engine when aiohttp is
+    installed and on a pool of GEMINI_CONCURRENCY threads otherwise.
+    """
+    cache_ids = cache_ids or (lambda batch: {})
+    plan = plan_summary_batches if batched else (lambda items: [[item] for item in items])
+    
+    if async_engine_available():
+        async def summarize_batch(batch):
+            try:
+                summaries = await gemini_summarize_batch_async(batch, cache_ids(batch))
+            except Exception as e:
+                on_batch_done(batch, None, e)
+            else:
+                on_batch_done(batch, summaries, None)
+        
+        run_summary_pipeline_async(chunks, summarize_batch, plan=plan)
+    else:
+        def summarize_batch(batch):
+            try:
+                summaries = gemini_summarize_batch(batch, cache_ids(batch))
+            except Exception as e:
+                on_batch_done(batch, None, e)
+            else:
+                on_batch_done(batch, summaries, None)
+        
+        run_summary_pipeline(chunks, summarize_batch, get_gemini_client().concurrency, plan=plan)
+
+# ========== SUMMARY SCHEDULER ==========
+# Scheduling priorities, most urgent first
+PRIORITY_SELECTED = 0
+PRIORITY_VISIBLE = 1
+PRIORITY_BACKGROUND = 2
+
+SummaryRequest = namedtuple('SummaryRequest', ['message_id', 'body', 'cache_id', 'priority'])
+
+class SummaryJob:
+    """One queued or in-flight summary and everyone waiting for it"""
+    
+    def __init__(self, request):
+        self.message_id = request.message_id
+        self.body = request.body
+        self.cache_id = request.cache_id
+        self.priority = request.priority
+        self.callbacks = []
+        self.on_partial = None
+        self.in_flight = False
+
+class SummaryScheduler:
+    """Priority queue between the desktop app and Gemini.
+    
+    The selected email goes first; it is streamed, may use one request beyond the
+    in-flight limit and is sent as urgent, so it never waits behind bulk work at the
+    scheduler or the Gemini client's limits. Rows on screen come next and
+    everything else fills idle capacity, packed into batches like plan_summary_batches.
+    A message id is queued or in flight at most once: submitting it again attaches to
+    the existing job and can only raise its priority.
+    
+    Requests run on the async engine when aiohttp is installed, otherwise on threads.
+    """
+    
+    def __init__(self, slots=None, max_queued=None):
+        self.slots = slots
+        self.max_queued = max_queued
+        self._heap = []  # (priority, sequence, job); stale entries are skipped on pop
+        self._jobs = {}  # message_id -> SummaryJob, queued or in flight
+        self._in_flight = 0  # requests, not emails
+        self._in_flight_jobs = 0
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._executor = None
+        self._use_async = False
+    
+    # ----- Public API -----
+    def submit(self, requests, on_done=None, on_partial=None):
+        """Queue SummaryRequests; on_done(message_id, summary, error) is called from a worker.
+        
+        Submit everything that is available at once so short emails can share a
+        request. on_partial(text) receives streamed fragments if a request is sent
+        on its own (selected emails).
+        """
+        with self._cond:
+            self._start()
+            for request in requests:
+                job = self._jobs.get(request.message_id)
+                if job is None:
+                    job = self._jobs[request.message_id] = SummaryJob(request)
+                    self._push(job)
+                elif not job.in_flight and request.priority < job.priority:
+                    job.priority = request.priority
+                    self._push(job)
+                if on_done is not None:
+                    job.callbacks.append(on_done)
+                if on_partial is not None and not job.in_flight:
+                    job.on_partial = on_partial
+            self._cond.notify_all()
+    
+    def prioritize(self, message_ids, priority):
+        """Raise queued jobs to priority (for example rows scrolled into view)"""
+        with self._cond:
+            for message_id in message_ids:
+                job = self._jobs.get(message_id)
+                if job is not None and not job.in_flight and priority < job.priority:
+                    job.priority = priority
+                    self._push(job)
+            self._cond.notify_all()
+    
+    def wait_for_room(self):
+        """Block while the backlog of queued emails is full (backpressure for fetching)"""
+        with self._cond:
+            self._start()
+            self._cond.wait_for(lambda: len(self._jobs) - self._in_flight_jobs < self.max_queued)
+    
+    # ----- Dispatching -----
+    def _start(self):
+        """Size the scheduler and start the dispatcher thread on first use (lock held)"""
+        if self._executor is not None:
+            return
+        self._use_async = async_engine_available()
+        if self.slots is None:
+            self.slots = config.GEMINI_ASYNC_CONCURRENCY if self._use_async else get_gemini_client().concurrency
+        if self.max_queued is None:
+            self.max_queued = self.slots * config.GEMINI_BATCH_MAX_EMAILS
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.slots + 1)
+        threading.Thread(target=self._dispatch_loop, name="summary-scheduler", daemon=True).start()
+    
+    def _push(self, job):
+        heapq.heappush(self._heap, (job.priority, next(self._sequence), job))
+    
+    def _peek(self):
+        """Highest-priority queued job, dropping stale heap entries (lock held)"""
+        while self._heap:
+            priority, _, job = self._heap[0]
+            if job.in_flight or priority != job.priority or self._jobs.get(job.message_id) is not job:
+                heapq.heappop(self._heap)
+                continue
+            return job
+        return None
+    
+    def _next_batch(self):
+        """Take the next jobs to send in one request, or None if there is no room (lock held)"""
+        job = self._peek()
+        if job is None:
+            return None
+        capacity = self.slots + (1 if job.priority == PRIORITY_SELECTED else 0)
+        if self._in_flight >= capacity:
+            return None
+        heapq.heappop(self._heap)
+        batch = [job]
+        
+        # Pack further short emails into the request, in priority order
+        tokens = estimate_tokens(job.body)
+        if job.priority != PRIORITY_SELECTED and tokens <= config.GEMINI_BATCH_MAX_EMAIL_TOKENS:
+            while len(batch) < config.GEMINI_BATCH_MAX_EMAILS:
+                candidate = self._peek()
+                if candidate is None:
+                    break
+                candidate_tokens = estimate_tokens(candidate.body)
+                if (candidate_tokens > config.GEMINI_BATCH_MAX_EMAIL_TOKENS
+                        or tokens + candidate_tokens > config.GEMINI_BATCH_TOKEN_BUDGET):
+                    break
+                heapq.heappop(self._heap)
+                batch.append(candidate)
+                tokens += candidate_tokens
+        
+        for job in batch:
+            job.in_flight = True
+        self._in_flight += 1
+        self._in_flight_jobs += len(batch)
+        return batch
+    
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                batch = self._next_batch()
+                while batch is None:
+                    self._cond.wait()
+                    batch = self._next_batch()
+            self._dispatch(batch)
+    
+    def _dispatch(self, batch):
+        items = [(job.message_id, job.body) for job in batch]
+        cache_ids = {job.message_id: job.cache_id for job in batch}
+        if len(batch) == 1 and (batch[0].on_partial is not None or batch[0].priority == PRIORITY_SELECTED):
+            job = batch[0]
+            future = self._executor.submit(lambda: {job.message_id: gemini_summarize_and_reply(
+                job.body, job.message_id, on_partial=job.on_partial, cache_id=job.cache_id,
+                urgent=job.priority == PRIORITY_SELECTED
+            )})
+        elif self._use_async:
+            future = async_engine.submit(gemini_summarize_batch_async(items, cache_ids))
+        else:
+            future = self._executor.submit(gemini_summarize_batch, items, cache_ids)
+        future.add_done_callback(lambda future: self._finish(batch, future))
+    
+    def _finish(self, batch, future):
+        try:
+            summaries = future.result()
+            error = None
+        except Exception as e:
+            summaries = {}
+            error = e
+        with self._cond:
+            self._in_flight -= 1
+            self._in_flight_jobs -= len(batch)
+            for job in batch:
+                del self._jobs[job.message_id]
+            self._cond.notify_all()
+        for job in batch:
+            summary = summaries.get(job.message_id)
+            for callback in job.callbacks:
+                try:
+                    callback(job.message_id, summary, error)
+                except Exception:
+                    pass
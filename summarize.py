@@ -0,0 +1,163 @@
+"""
+Headless bulk summarizer for AI Email Summarizer Pro.
+
+Fetches the emails matching a Gmail search query, summarizes them with Gemini and
+writes one JSON object per email (JSONL) as soon as its summary is ready. No display
+is needed, so it can run from cron on a server:
+
+    python summarize.py --query "is:unread newer_than:1d" --max 50 --output digest.jsonl
+
+Gmail access uses the token cached by the desktop app (token.pkl): log in once with
+the app, then copy the token file to the machine running this script.
+"""
+
+import argparse
+import json
+import sys
+import threading
+
+import config
+import email_core
+from email_core import (
+    load_credentials, save_credentials, build_gmail_service, fetch_emails_batch,
+    get_gemini_api_key, summarize_pipeline
+)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize Gmail messages with Gemini and write the results as JSONL.")
+    parser.add_argument("--query", default="category:primary",
+                        help="Gmail search query (default: %(default)s)")
+    parser.add_argument("--label", action="append", dest="labels",
+                        help="restrict to a label id; repeatable (default: INBOX)")
+    parser.add_argument("--max", type=int, default=20, dest="max_emails",
+                        help="maximum number of emails to summarize (default: %(default)s)")
+    parser.add_argument("--output", default="-",
+                        help="JSONL file to append to, or - for stdout (default: %(default)s)")
+    parser.add_argument("--token", default=config.GMAIL_TOKEN_CACHE,
+                        help="cached Gmail OAuth token (default: %(default)s)")
+    parser.add_argument("--concurrency", type=int,
+                        help=f"parallel Gemini requests (default: {config.GEMINI_CONCURRENCY}, "
+                             f"or {config.GEMINI_ASYNC_CONCURRENCY} with aiohttp installed)")
+    parser.add_argument("--rpm", type=int,
+                        help=f"Gemini requests per minute (default: {config.GEMINI_REQUESTS_PER_MINUTE})")
+    parser.add_argument("--cache-file",
+                        help="summary cache database (default: the desktop app's cache)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always ask Gemini, never read or write cached summaries")
+    parser.add_argument("--no-batch", action="store_true",
+                        help="send every email in its own Gemini request")
+    return parser.parse_args(argv)
+
+
+def get_gmail_service(token_path):
+    """Build the Gmail service from the cached token, refreshing it if it has expired"""
+    creds = load_credentials(token_path)
+    if creds is None:
+        raise RuntimeError(f"No Gmail token at {token_path}. Log in with the desktop app first and copy its token file here.")
+    if not creds.valid:
+        if not (creds.expired and creds.refresh_token):
+            raise RuntimeError(f"Gmail token at {token_path} is invalid. Log in again with the desktop app.")
+        from google.auth.transport.requests import Request
+        creds.refresh(Request())
+        save_credentials(creds, token_path)
+    return build_gmail_service(creds)
+
+
+def list_message_ids(service, query, labels, max_emails):
+    """Ids of the newest max_emails messages matching the query, following nextPageToken"""
+    ids = []
+    page_token = None
+    while len(ids) < max_emails:
+        results = service.users().messages().list(
+            userId='me',
+            labelIds=labels,
+            q=query,
+            maxResults=min(500, max_emails - len(ids)),
+            pageToken=page_token
+        ).execute()
+        ids.extend(message['id'] for message in results.get('messages', []))
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            break
+    return ids[:max_emails]
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if not get_gemini_api_key():
+        print("Error: GEMINI_API_KEY is not set (app data .env, environment or config.py)", file=sys.stderr)
+        return 2
+    if args.no_cache:
+        email_core.configure_summary_cache(enabled=False)
+    elif args.cache_file:
+        email_core.configure_summary_cache(args.cache_file)
+    if args.concurrency:
+        config.GEMINI_ASYNC_CONCURRENCY = args.concurrency
+    email_core.configure_gemini_client(args.concurrency, args.rpm)
+
+    try:
+        service = get_gmail_service(args.token)
+        message_ids = list_message_ids(service, args.query, args.labels or ['INBOX'], args.max_emails)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    out = sys.stdout if args.output == "-" else open(args.output, "a", encoding="utf-8")
+    write_lock = threading.Lock()
+    fetched = {}
+    failures = [0]
+
+    def write_result(message_id, summary, error=None):
+        subject, sender, _ = fetched.get(message_id, ("", "", ""))
+        if error is None and summary.startswith("Error"):
+            error, summary = summary, None
+        record = {"id": message_id, "subject": subject, "sender": sender, "summary": summary, "error": error}
+        with write_lock:
+            if error:
+                failures[0] += 1
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+
+    def on_batch_done(batch, summaries, error):
+        if summaries is None:
+            for message_id, _ in batch:
+                write_result(message_id, None, str(error))
+            return
+        for message_id, summary in summaries.items():
+            write_result(message_id, summary)
+
+    def fetch_chunks():
+        # Small fetch batches so summaries start while the rest is still downloading
+        step = config.GMAIL_PIPELINE_BATCH_SIZE
+        for start in range(0, len(message_ids), step):
+            chunk = message_ids[start:start + step]
+            fetched.update(fetch_emails_batch(service, chunk))
+            pending = []
+            for message_id in chunk:
+                _, _, body = fetched.get(message_id, ("", "", "Error reading email: not returned by Gmail"))
+                if body.startswith("Error reading email"):
+                    # Record the fetch failure instead of summarizing the error text
+                    fetched[message_id] = ("", "", "")
+                    write_result(message_id, None, body)
+                else:
+                    pending.append((message_id, body))
+            if pending:
+                yield pending
+
+    try:
+        summarize_pipeline(fetch_chunks(), on_batch_done, batched=not args.no_batch)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(f"Summarized {len(fetched) - failures[0]} of {len(fetched)} emails", file=sys.stderr)
+    return 1 if failures[0] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+fetch_emails_batch against a fake Gmail transport fed with the demo emails.
+
+Each message used to cost two messages().get round-trips (metadata, then full);
+the batch fetch must cost ceil(N / batch_size) round-trips for N messages, with
+transient per-call failures (429) retried in a follow-up batch.
+"""
+
+import base64
+import copy
+import math
+
+import pytest
+
+import config
+import demo_data
+import email_core
+
+
+class FakeHttpError(Exception):
+    """Stands in for googleapiclient.errors.HttpError (only .resp.status is used)"""
+    
+    def __init__(self, status):
+        super().__init__(f"HttpError {status}")
+        self.resp = type("Response", (), {"status": status})()
+
+
+class FakeGmail:
+    """Gmail service whose HTTP batches are answered from a dict of message resources"""
+    
+    def __init__(self, messages, failures=None):
+        self.messages_by_id = messages
+        self.failures = failures or {}  # message id -> statuses to fail with, one per attempt
+        self.round_trips = 0
+        self.calls = []
+    
+    # service.users().messages().get(...)
+    def users(self):
+        return self
+    
+    def messages(self):
+        return self
+    
+    def get(self, userId, id, format):
+        assert format == 'full'
+        return id
+    
+    def new_batch_http_request(self, callback):
+        return FakeBatch(self, callback)
+
+
+class FakeBatch:
+    def __init__(self, gmail, callback):
+        self.gmail = gmail
+        self.callback = callback
+        self.requests = []
+    
+    def add(self, request, request_id):
+        assert request_id not in [existing for existing, _ in self.requests]
+        self.requests.append((request_id, request))
+    
+    def execute(self):
+        assert len(self.requests) <= 100  # Gmail's hard limit per batch
+        self.gmail.round_trips += 1
+        for request_id, msg_id in self.requests:
+            self.gmail.calls.append(msg_id)
+            statuses = self.gmail.failures.get(msg_id)
+            if statuses:
+                self.callback(request_id, None, FakeHttpError(statuses.pop(0)))
+            else:
+                self.callback(request_id, self.gmail.messages_by_id[msg_id], None)
+
+
+def demo_messages(count):
+    """count Gmail message resources cycled from demo_data, with unique ids"""
+    messages = {}
+    for index in range(count):
+        message = copy.deepcopy(demo_data.get_demo_in_gmail_format(index % len(demo_data.DEMO_EMAILS)))
+        message['id'] = f"{message['id']}-{index}"
+        # Real payloads carry base64url-encoded bodies
+        body = message['payload']['body']['data']
+        message['payload']['mimeType'] = 'text/plain'
+        message['payload']['body']['data'] = base64.urlsafe_b64encode(body.encode('utf-8')).decode('ascii')
+        messages[message['id']] = message
+    return messages
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(email_core.time, "sleep", lambda seconds: None)
+
+
+@pytest.mark.parametrize("count", [1, 5, 50, 120])
+def test_one_round_trip_per_batch(count):
+    messages = demo_messages(count)
+    gmail = FakeGmail(messages)
+    
+    results = email_core.fetch_emails_batch(gmail, list(messages))
+    
+    assert gmail.round_trips == math.ceil(count / config.GMAIL_BATCH_SIZE)
+    assert gmail.round_trips < 2 * count
+    assert sorted(gmail.calls) == sorted(messages)  # every message fetched exactly once
+    for msg_id, message in messages.items():
+        subject, sender, body = results[msg_id]
+        demo = demo_data.get_demo_email(int(msg_id.rsplit('-', 1)[1]) % len(demo_data.DEMO_EMAILS))
+        assert (subject, sender) == (demo['subject'], demo['sender'])
+        assert body and not body.startswith("Error reading email")
+
+
+def test_duplicate_ids_are_fetched_once():
+    messages = demo_messages(3)
+    ids = list(messages)
+    gmail = FakeGmail(messages)
+    
+    results = email_core.fetch_emails_batch(gmail, ids + ids)
+    
+    assert gmail.calls == ids
+    assert set(results) == set(ids)
+
+
+def test_rate_limited_calls_are_retried_in_a_follow_up_batch():
+    messages = demo_messages(10)
+    ids = list(messages)
+    gmail = FakeGmail(messages, failures={ids[2]: [429], ids[7]: [503, 429]})
+    
+    results = email_core.fetch_emails_batch(gmail, ids)
+    
+    assert gmail.round_trips == 3
+    assert gmail.calls[10:] == [ids[2], ids[7], ids[7]]
+    assert not any(body.startswith("Error reading email") for _, _, body in results.values())
+
+
+def test_permanent_errors_are_not_retried():
+    messages = demo_messages(4)
+    ids = list(messages)
+    gmail = FakeGmail(messages, failures={ids[1]: [404], ids[3]: [429] * (config.GMAIL_BATCH_MAX_RETRIES + 1)})
+    
+    results = email_core.fetch_emails_batch(gmail, ids)
+    
+    assert gmail.calls.count(ids[1]) == 1
+    assert gmail.calls.count(ids[3]) == config.GMAIL_BATCH_MAX_RETRIES + 1
+    assert results[ids[1]][2].startswith("Error reading email")
+    assert results[ids[3]][2].startswith("Error reading email")
+    assert not results[ids[0]][2].startswith("Error reading email")